@@ -52,6 +52,26 @@ BEGIN
 END $$;
 */
 
+-- Plain coordinate columns for scanner and device positions, so hot reads
+-- need no geometry functions. Generated from the geometry, which stays for
+-- spatial queries and indexes
+DO $$ 
+BEGIN
+    IF NOT check_schema_version(2) THEN
+        ALTER TABLE scanner_locations
+        ADD COLUMN IF NOT EXISTS x DOUBLE PRECISION GENERATED ALWAYS AS (ST_X(location)) STORED,
+        ADD COLUMN IF NOT EXISTS y DOUBLE PRECISION GENERATED ALWAYS AS (ST_Y(location)) STORED,
+        ADD COLUMN IF NOT EXISTS z DOUBLE PRECISION GENERATED ALWAYS AS (ST_Z(location)) STORED;
+        
+        ALTER TABLE device_positions
+        ADD COLUMN IF NOT EXISTS x DOUBLE PRECISION GENERATED ALWAYS AS (ST_X(position)) STORED,
+        ADD COLUMN IF NOT EXISTS y DOUBLE PRECISION GENERATED ALWAYS AS (ST_Y(position)) STORED,
+        ADD COLUMN IF NOT EXISTS z DOUBLE PRECISION GENERATED ALWAYS AS (ST_Z(position)) STORED;
+        
+        PERFORM update_schema_version(2, 'Added x/y/z columns to scanner locations and device positions');
+    END IF;
+END $$;
+
 -- Create maintenance functions
 CREATE OR REPLACE FUNCTION cleanup_old_readings(
     retention_days INTEGER DEFAULT 30
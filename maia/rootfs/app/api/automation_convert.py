@@ -0,0 +1,267 @@
+"""
+Automation API models and their conversion to and from engine rules.
+
+Kept free of FastAPI so the converters can be compiled on their own.
+"""
+from operator import attrgetter
+from typing import Dict, List, Optional, Any
+from pydantic import BaseModel
+from datetime import time, timedelta
+from ..core.automation_rules import (
+    AutomationRule, Action, TimeCondition,
+    DeviceCondition, CountCondition
+)
+
+# API Models
+class TimeConditionModel(BaseModel):
+    """Time condition model."""
+    start_time: Optional[time] = None
+    end_time: Optional[time] = None
+    days_of_week: Optional[List[int]] = None
+
+class DeviceConditionModel(BaseModel):
+    """Device condition model."""
+    required_zones: Optional[List[str]] = None
+    excluded_zones: Optional[List[str]] = None
+    min_dwell_time: Optional[float] = None  # seconds
+
+class CountConditionModel(BaseModel):
+    """Count condition model."""
+    event_type: str
+    zone_id: Optional[str] = None
+    device_mac: Optional[str] = None
+    min_count: Optional[int] = None
+    max_count: Optional[int] = None
+    time_window: Optional[float] = None  # seconds
+
+class ActionModel(BaseModel):
+    """Action model."""
+    action_type: str
+    target: str
+    parameters: Optional[Dict[str, Any]] = None
+    delay: Optional[float] = None  # seconds
+
+class AutomationRuleCreate(BaseModel):
+    """Automation rule creation model."""
+    name: str
+    description: Optional[str] = None
+    trigger_events: List[str]
+    trigger_zones: Optional[List[str]] = None
+    trigger_devices: Optional[List[str]] = None
+    time_conditions: Optional[List[TimeConditionModel]] = None
+    device_conditions: Optional[List[DeviceConditionModel]] = None
+    count_conditions: Optional[List[CountConditionModel]] = None
+    actions: List[ActionModel]
+    enabled: bool = True
+    metadata: Optional[Dict[str, Any]] = None
+    sequential: bool = True
+
+class AutomationRuleUpdate(BaseModel):
+    """Automation rule update model."""
+    name: Optional[str] = None
+    description: Optional[str] = None
+    trigger_events: Optional[List[str]] = None
+    trigger_zones: Optional[List[str]] = None
+    trigger_devices: Optional[List[str]] = None
+    time_conditions: Optional[List[TimeConditionModel]] = None
+    device_conditions: Optional[List[DeviceConditionModel]] = None
+    count_conditions: Optional[List[CountConditionModel]] = None
+    actions: Optional[List[ActionModel]] = None
+    enabled: Optional[bool] = None
+    metadata: Optional[Dict[str, Any]] = None
+    sequential: Optional[bool] = None
+
+class AutomationRuleResponse(BaseModel):
+    """Automation rule response model."""
+    rule_id: str
+    name: str
+    description: Optional[str] = None
+    trigger_events: List[str]
+    trigger_zones: Optional[List[str]] = None
+    trigger_devices: Optional[List[str]] = None
+    time_conditions: Optional[List[TimeConditionModel]] = None
+    device_conditions: Optional[List[DeviceConditionModel]] = None
+    count_conditions: Optional[List[CountConditionModel]] = None
+    actions: List[ActionModel]
+    enabled: bool
+    metadata: Optional[Dict[str, Any]] = None
+    sequential: bool = True
+
+# Field accessors for the response converters; attrgetter fetches all
+# fields of a condition/action in one C-level call
+_get_time_fields = attrgetter("start_time", "end_time", "days_of_week")
+_get_device_fields = attrgetter("required_zones", "excluded_zones", "min_dwell_time")
+_get_count_fields = attrgetter(
+    "event_type", "zone_id", "device_mac", "min_count", "max_count", "time_window"
+)
+_get_action_fields = attrgetter("action_type", "target", "parameters", "delay")
+
+def _seconds(value: Optional[timedelta]) -> Optional[float]:
+    """Convert optional timedelta to seconds."""
+    return value.total_seconds() if value else None
+
+def convert_rule_to_response(rule: AutomationRule) -> AutomationRuleResponse:
+    """Convert AutomationRule to response model."""
+    # Rule contents were validated on the way in, so nested models are
+    # built with model_construct to skip re-validation
+    return AutomationRuleResponse(
+        rule_id=rule.rule_id,
+        name=rule.name,
+        description=rule.description,
+        trigger_events=rule.trigger_events,
+        trigger_zones=rule.trigger_zones,
+        trigger_devices=rule.trigger_devices,
+        time_conditions=[
+            TimeConditionModel.model_construct(
+                start_time=start_time,
+                end_time=end_time,
+                days_of_week=days_of_week
+            )
+            for start_time, end_time, days_of_week
+            in map(_get_time_fields, rule.time_conditions or ())
+        ],
+        device_conditions=[
+            DeviceConditionModel.model_construct(
+                required_zones=required_zones,
+                excluded_zones=excluded_zones,
+                min_dwell_time=_seconds(min_dwell_time)
+            )
+            for required_zones, excluded_zones, min_dwell_time
+            in map(_get_device_fields, rule.device_conditions or ())
+        ],
+        count_conditions=[
+            CountConditionModel.model_construct(
+                event_type=event_type,
+                zone_id=zone_id,
+                device_mac=device_mac,
+                min_count=min_count,
+                max_count=max_count,
+                time_window=_seconds(time_window)
+            )
+            for event_type, zone_id, device_mac, min_count, max_count, time_window
+            in map(_get_count_fields, rule.count_conditions or ())
+        ],
+        actions=[
+            ActionModel.model_construct(
+                action_type=action_type,
+                target=target,
+                parameters=parameters,
+                delay=_seconds(delay)
+            )
+            for action_type, target, parameters, delay
+            in map(_get_action_fields, rule.actions)
+        ],
+        enabled=rule.enabled,
+        metadata=rule.metadata,
+        sequential=rule.sequential
+    )
+
+def convert_model_to_rule(model: AutomationRuleCreate, rule_id: str) -> AutomationRule:
+    """Convert request model to AutomationRule."""
+    return AutomationRule(
+        rule_id=rule_id,
+        name=model.name,
+        description=model.description,
+        trigger_events=model.trigger_events,
+        trigger_zones=model.trigger_zones,
+        trigger_devices=model.trigger_devices,
+        time_conditions=[
+            TimeCondition(
+                start_time=cond.start_time,
+                end_time=cond.end_time,
+                days_of_week=cond.days_of_week
+            )
+            for cond in (model.time_conditions or [])
+        ],
+        device_conditions=[
+            DeviceCondition(
+                required_zones=cond.required_zones,
+                excluded_zones=cond.excluded_zones,
+                min_dwell_time=timedelta(seconds=cond.min_dwell_time) if cond.min_dwell_time else None
+            )
+            for cond in (model.device_conditions or [])
+        ],
+        count_conditions=[
+            CountCondition(
+                event_type=cond.event_type,
+                zone_id=cond.zone_id,
+                device_mac=cond.device_mac,
+                min_count=cond.min_count,
+                max_count=cond.max_count,
+                time_window=timedelta(seconds=cond.time_window) if cond.time_window else None
+            )
+            for cond in (model.count_conditions or [])
+        ],
+        actions=[
+            Action(
+                action_type=action.action_type,
+                target=action.target,
+                parameters=action.parameters,
+                delay=timedelta(seconds=action.delay) if action.delay else None
+            )
+            for action in model.actions
+        ],
+        enabled=model.enabled,
+        metadata=model.metadata,
+        sequential=model.sequential
+    )
+
+def update_rule_from_model(rule: AutomationRule, model: AutomationRuleUpdate) -> AutomationRule:
+    """Update AutomationRule from update model."""
+    if model.name is not None:
+        rule.name = model.name
+    if model.description is not None:
+        rule.description = model.description
+    if model.trigger_events is not None:
+        rule.trigger_events = model.trigger_events
+    if model.trigger_zones is not None:
+        rule.trigger_zones = model.trigger_zones
+    if model.trigger_devices is not None:
+        rule.trigger_devices = model.trigger_devices
+    if model.time_conditions is not None:
+        rule.time_conditions = [
+            TimeCondition(
+                start_time=cond.start_time,
+                end_time=cond.end_time,
+                days_of_week=cond.days_of_week
+            )
+            for cond in model.time_conditions
+        ]
+    if model.device_conditions is not None:
+        rule.device_conditions = [
+            DeviceCondition(
+                required_zones=cond.required_zones,
+                excluded_zones=cond.excluded_zones,
+                min_dwell_time=timedelta(seconds=cond.min_dwell_time) if cond.min_dwell_time else None
+            )
+            for cond in model.device_conditions
+        ]
+    if model.count_conditions is not None:
+        rule.count_conditions = [
+            CountCondition(
+                event_type=cond.event_type,
+                zone_id=cond.zone_id,
+                device_mac=cond.device_mac,
+                min_count=cond.min_count,
+                max_count=cond.max_count,
+                time_window=timedelta(seconds=cond.time_window) if cond.time_window else None
+            )
+            for cond in model.count_conditions
+        ]
+    if model.actions is not None:
+        rule.actions = [
+            Action(
+                action_type=action.action_type,
+                target=action.target,
+                parameters=action.parameters,
+                delay=timedelta(seconds=action.delay) if action.delay else None
+            )
+            for action in model.actions
+        ]
+    if model.enabled is not None:
+        rule.enabled = model.enabled
+    if model.metadata is not None:
+        rule.metadata = model.metadata
+    if model.sequential is not None:
+        rule.sequential = model.sequential
+    return rule
@@ -3,13 +3,18 @@ from typing import Union
 
 def format_datetime(value: Union[datetime, str]) -> str:
     """Format a datetime object or string into a human-readable format."""
-    if isinstance(value, str):
+    value_type = type(value)
+    if value_type is str:
+        # Only attempt parsing for strings that could be an ISO date, basic
+        # (20240101) or extended (2024-01-01), since a raised ValueError
+        # costs far more than the sniff
+        if len(value) < 8 or not value[0].isdigit():
+            return value
         try:
             value = datetime.fromisoformat(value.replace('Z', '+00:00'))
         except ValueError:
             return value
-    
-    if not isinstance(value, datetime):
+    elif value_type is not datetime and not isinstance(value, datetime):
         return str(value)
     
     now = datetime.now(value.tzinfo)
@@ -2,7 +2,9 @@
 Main API module for MAIA.
 """
 import os
+import hashlib
 from datetime import timedelta
+from cachetools import TTLCache
 from fastapi import FastAPI, Request, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.staticfiles import StaticFiles
@@ -35,6 +37,14 @@ templates = Jinja2Templates(directory=templates_dir)
 # Initialize Home Assistant client
 ha_client = None
 
+# Tokens recently accepted by Home Assistant, keyed by digest. Failures
+# are never cached so the cache cannot be used as a validity oracle.
+_accepted_tokens = TTLCache(maxsize=1024, ttl=30)
+
+def _token_key(token: str) -> bytes:
+    """Get cache key for a token without keeping the token itself."""
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize the Home Assistant client on startup."""
@@ -66,22 +76,17 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
         )
     
     # Use the provided token to validate against Home Assistant
-    headers = {"Authorization": f"Bearer {form_data.password}"}
-    try:
-        async with ha_client.session.get(f"{ha_client.base_url}/api/", headers=headers) as response:
-            if response.status != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid Home Assistant token",
-                    headers={"WWW-Authenticate": "Bearer"},
-                )
-        return {"access_token": form_data.password, "token_type": "bearer"}
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=str(e),
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    key = _token_key(form_data.password)
+    if key not in _accepted_tokens:
+        if not await ha_client.check_token(form_data.password):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid Home Assistant token",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        _accepted_tokens[key] = True
+        
+    return {"access_token": form_data.password, "token_type": "bearer"}
 
 @app.get("/")
 async def root(request: Request):
@@ -1,12 +1,12 @@
 """
 API routes for MAIA.
 """
-from fastapi import FastAPI, WebSocket, HTTPException, UploadFile, File
-from fastapi.responses import JSONResponse
-from typing import Dict, List, Optional, Any
+from fastapi import FastAPI, WebSocket, HTTPException, UploadFile, File, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import AsyncIterator, Dict, List, Optional, Any
 import asyncio
 import logging
-import json
+import orjson
 from datetime import datetime
 from ..core.voice_processor import VoiceProcessor
 from ..core.camera_processor import CameraProcessor
@@ -28,6 +28,25 @@ openai_integration = None
 face_storage = None
 command_storage = None
 
+# Pre-serialized health response around the timestamp; components only
+# change on startup, so the body is rebuilt there instead of per request
+_HEALTH_PREFIX = b'{"status":"healthy","timestamp":"'
+_health_suffix = b""
+
+def _refresh_health():
+    """Rebuild the cached component part of the health response."""
+    global _health_suffix
+    components = orjson.dumps({
+        "voice_processor": bool(voice_processor),
+        "camera_processor": bool(camera_processor),
+        "openai_integration": bool(openai_integration),
+        "face_storage": bool(face_storage),
+        "command_storage": bool(command_storage)
+    })
+    _health_suffix = b'","components":' + components + b"}"
+
+_refresh_health()
+
 @app.on_event("startup")
 async def startup():
     """Initialize components on startup."""
@@ -49,6 +68,9 @@ async def startup():
     except Exception as e:
         _LOGGER.error(f"Failed to initialize MAIA API: {str(e)}")
         raise
+        
+    finally:
+        _refresh_health()
 
 @app.on_event("shutdown")
 async def shutdown():
@@ -66,6 +88,52 @@ async def shutdown():
     except Exception as e:
         _LOGGER.error(f"Error during shutdown: {str(e)}")
 
+# Largest raw upload body accepted; the stream is cut off past it instead
+# of being buffered whole
+_MAX_UPLOAD_BYTES = 32 * 1024 * 1024
+
+def _upload_body(field: str) -> Dict[str, Any]:
+    """OpenAPI request body for a raw or multipart upload in field."""
+    binary = {"type": "string", "format": "binary"}
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/octet-stream": {"schema": binary},
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {field: binary},
+                        "required": [field]
+                    }
+                }
+            }
+        }
+    }
+
+async def _read_upload(request: Request, field: str) -> bytes:
+    """Read upload data from the raw request body or a multipart field."""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        # Keep accepting form uploads from existing clients; closing the
+        # form removes its spooled temporary files
+        async with request.form() as form:
+            upload = form.get(field)
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(status_code=400, detail=f"Missing {field} upload")
+            return await upload.read()
+            
+    # Raw body, read chunk by chunk as it arrives so an oversized upload
+    # is rejected before it is held in memory
+    buffer = bytearray()
+    async for chunk in request.stream():
+        buffer += chunk
+        if len(buffer) > _MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"{field} upload too large")
+    if not buffer:
+        raise HTTPException(status_code=400, detail=f"Missing {field} upload")
+    return bytes(buffer)
+
 @app.get("/")
 async def root():
     """Root endpoint."""
@@ -75,12 +143,12 @@ async def root():
         "status": "running"
     }
 
-@app.post("/voice/process")
-async def process_voice(audio: UploadFile = File(...)):
+@app.post("/voice/process", openapi_extra=_upload_body("audio"))
+async def process_voice(request: Request):
     """Process voice command."""
     try:
         # Read audio data
-        audio_data = await audio.read()
+        audio_data = await _read_upload(request, "audio")
         
         # Process audio
         result = await voice_processor.process_audio(audio_data)
@@ -92,16 +160,19 @@ async def process_voice(audio: UploadFile = File(...)):
         
         return JSONResponse(content=result)
         
+    except HTTPException:
+        raise
+        
     except Exception as e:
         _LOGGER.error(f"Voice processing failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/camera/process")
-async def process_frame(frame: UploadFile = File(...)):
+@app.post("/camera/process", openapi_extra=_upload_body("frame"))
+async def process_frame(request: Request):
     """Process camera frame."""
     try:
         # Read frame data
-        frame_data = await frame.read()
+        frame_data = await _read_upload(request, "frame")
         
         # Process frame
         result = await camera_processor.process_frame(frame_data)
@@ -110,6 +181,9 @@ async def process_frame(frame: UploadFile = File(...)):
             
         return JSONResponse(content=result)
         
+    except HTTPException:
+        raise
+        
     except Exception as e:
         _LOGGER.error(f"Frame processing failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -169,40 +243,103 @@ async def get_recent_commands(
     limit: int = 100,
     offset: int = 0
 ):
-    """Get recent commands."""
+    """Get recent commands, streamed as they are read from storage."""
+    # List the keys before the response starts, so a storage failure is
+    # still reported as an error status
     try:
-        commands = await command_storage.get_recent_commands(limit, offset)
-        return {"commands": commands, "total": len(commands)}
-        
+        cmd_keys = await command_storage.recent_command_keys(limit, offset)
     except Exception as e:
         _LOGGER.error(f"Failed to get recent commands: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+        
+    async def generate() -> AsyncIterator[bytes]:
+        total = 0
+        yield b'{"commands":['
+        try:
+            async for command in command_storage.iter_commands(cmd_keys):
+                yield (b"," if total else b"") + orjson.dumps(command)
+                total += 1
+        except Exception as e:
+            # Headers are already sent; abort the response rather than
+            # closing the document over a truncated list
+            _LOGGER.error(f"Failed to stream recent commands: {str(e)}")
+            raise
+        yield b'],"total":' + str(total).encode() + b"}"
+        
+    return StreamingResponse(generate(), media_type="application/json")
+
+async def _process_ws_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Process a single WebSocket message."""
+    if message.get("type") == "voice":
+        return await voice_processor.process_audio(
+            message.get("data", "").encode()
+        )
+    if message.get("type") == "camera":
+        return await camera_processor.process_frame(
+            message.get("data", "").encode()
+        )
+    return {"error": "Invalid message type"}
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time communication."""
-    try:
-        await websocket.accept()
-        
+    # Receiving, processing and sending run as separate tasks so reads and
+    # writes overlap with processing. None marks the end of each queue.
+    incoming: asyncio.Queue = asyncio.Queue(maxsize=32)
+    outgoing: asyncio.Queue = asyncio.Queue(maxsize=32)
+    
+    async def receiver():
         while True:
-            # Receive message
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            # Receive message, parsing binary frames without a str decode
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                await incoming.put(None)
+                return
+            binary = frame.get("bytes") is not None
+            message = orjson.loads(frame["bytes"] if binary else frame["text"])
+            await incoming.put((message, binary))
             
-            # Process message
-            if message.get("type") == "voice":
-                result = await voice_processor.process_audio(
-                    message.get("data", "").encode()
-                )
-            elif message.get("type") == "camera":
-                result = await camera_processor.process_frame(
-                    message.get("data", "").encode()
-                )
+    async def worker():
+        while True:
+            # Process everything queued so far concurrently, keeping order
+            batch = [await incoming.get()]
+            while not incoming.empty():
+                batch.append(incoming.get_nowait())
+            done = None in batch
+            if done:
+                batch = batch[:batch.index(None)]
+                
+            results = await asyncio.gather(
+                *(_process_ws_message(message) for message, _ in batch)
+            )
+            for (_, binary), result in zip(batch, results):
+                await outgoing.put((result, binary))
+                
+            if done:
+                await outgoing.put(None)
+                return
+                
+    async def sender():
+        while True:
+            item = await outgoing.get()
+            if item is None:
+                return
+                
+            # Send response using the frame type the client sent
+            result, binary = item
+            payload = orjson.dumps(result)
+            if binary:
+                await websocket.send_bytes(payload)
             else:
-                result = {"error": "Invalid message type"}
+                await websocket.send_text(payload.decode())
                 
-            # Send response
-            await websocket.send_text(json.dumps(result))
+    try:
+        await websocket.accept()
+        
+        async with asyncio.TaskGroup() as group:
+            group.create_task(receiver())
+            group.create_task(worker())
+            group.create_task(sender())
             
     except Exception as e:
         _LOGGER.error(f"WebSocket error: {str(e)}")
@@ -212,14 +349,7 @@ async def websocket_endpoint(websocket: WebSocket):
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "components": {
-            "voice_processor": bool(voice_processor),
-            "camera_processor": bool(camera_processor),
-            "openai_integration": bool(openai_integration),
-            "face_storage": bool(face_storage),
-            "command_storage": bool(command_storage)
-        }
-    } 
\ No newline at end of file
+    return Response(
+        content=_HEALTH_PREFIX + datetime.now().isoformat().encode() + _health_suffix,
+        media_type="application/json"
+    )
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
 from ..schemas import StreamCreate, StreamResponse
@@ -11,7 +11,7 @@ router = APIRouter()
 logger = get_logger(__name__)
 
 @router.post("/streams", response_model=StreamResponse)
-async def create_stream(stream: StreamCreate, db: Session = Depends(get_db)):
+async def create_stream(stream: StreamCreate, db: AsyncSession = Depends(get_db)):
     """Register a new external stream."""
     try:
         logger.info(f"Registering new external stream: {stream.name}")
@@ -30,7 +30,7 @@ async def create_stream(stream: StreamCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/streams", response_model=List[StreamResponse])
-async def list_streams(db: Session = Depends(get_db)):
+async def list_streams(db: AsyncSession = Depends(get_db)):
     """List all registered external streams."""
     try:
         logger.info("Fetching list of external streams")
@@ -42,7 +42,7 @@ async def list_streams(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/streams/{stream_id}", response_model=StreamResponse)
-async def get_stream(stream_id: str, db: Session = Depends(get_db)):
+async def get_stream(stream_id: str, db: AsyncSession = Depends(get_db)):
     """Get details of a specific external stream."""
     try:
         logger.info(f"Fetching details for stream {stream_id}")
@@ -58,7 +58,7 @@ async def get_stream(stream_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/streams/{stream_id}")
-async def delete_stream(stream_id: str, db: Session = Depends(get_db)):
+async def delete_stream(stream_id: str, db: AsyncSession = Depends(get_db)):
     """Remove an external stream."""
     try:
         logger.info(f"Removing stream {stream_id}")
@@ -71,7 +71,7 @@ async def delete_stream(stream_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/streams/{stream_id}", response_model=StreamResponse)
-async def update_stream(stream_id: str, stream: StreamCreate, db: Session = Depends(get_db)):
+async def update_stream(stream_id: str, stream: StreamCreate, db: AsyncSession = Depends(get_db)):
     """Update an external stream's configuration."""
     try:
         logger.info(f"Updating stream {stream_id}")
@@ -91,7 +91,7 @@ async def update_stream(stream_id: str, stream: StreamCreate, db: Session = Depe
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/streams/{stream_id}/check")
-async def check_stream_health(stream_id: str, db: Session = Depends(get_db)):
+async def check_stream_health(stream_id: str, db: AsyncSession = Depends(get_db)):
     """Check the health of an external stream."""
     try:
         logger.info(f"Checking health of stream {stream_id}")
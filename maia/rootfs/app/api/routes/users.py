@@ -1,7 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from typing import List
-import traceback
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload, raiseload
+from typing import List, Optional
+from cachetools import TTLCache
 
 from ..database import get_db
 from ..models import HAUser, Face, Voice, Device, TrainingFeedback
@@ -15,34 +20,166 @@ from ...core.logging import get_logger
 logger = get_logger(__name__)
 router = APIRouter()
 
-@router.get("/users", response_model=List[UserResponse])
-async def get_users(db: Session = Depends(get_db)):
+# UserResponse expands every collection, so load them up front with one
+# SELECT ... IN per relationship instead of lazy loading per user. Any
+# other relationship touched while serializing raises instead of silently
+# issuing a query per row.
+_USER_RELATIONSHIPS = (
+    selectinload(HAUser.faces),
+    selectinload(HAUser.voices),
+    selectinload(HAUser.devices),
+    raiseload("*"),
+)
+_NO_LAZY_LOADS = raiseload("*")
+
+# Validates ORM rows and encodes the result to JSON in one Rust pass,
+# skipping FastAPI's jsonable_encoder and stdlib json
+_users_adapter = TypeAdapter(List[UserResponse])
+_faces_adapter = TypeAdapter(List[FaceResponse])
+_voices_adapter = TypeAdapter(List[VoiceResponse])
+_devices_adapter = TypeAdapter(List[DeviceResponse])
+
+# Serialized list responses. Every write clears the cache and bumps the
+# version; the TTL bounds staleness across worker processes.
+_response_cache: TTLCache = TTLCache(maxsize=8, ttl=10)
+_cache_version = 0
+
+def _invalidate_cache():
+    """Drop cached list responses after a write."""
+    global _cache_version
+    _cache_version += 1
+    _response_cache.clear()
+
+def _cache_store(key: str, version: int, content: bytes):
+    """Cache a response unless a write happened while it was built."""
+    if version == _cache_version:
+        _response_cache[key] = content
+
+def _json_response(content: bytes) -> Response:
+    """Wrap serialized JSON in a response."""
+    return Response(content=content, media_type="application/json")
+
+_STREAM_BATCH_SIZE = 500
+# Streamed bodies up to this size are also cached; larger ones are not kept
+_STREAM_CACHE_MAX_BYTES = 1 << 20
+
+def _stream_session(request: Request):
+    """Open a session owned by a streamed body.
+    
+    The request's session may be closed before the body is sent, so the
+    stream opens its own through get_db, honouring dependency overrides.
+    """
+    dependency = request.app.dependency_overrides.get(get_db, get_db)
+    return asynccontextmanager(dependency)()
+
+async def _list_response(request: Request, key: str, model, adapter: TypeAdapter) -> Response:
+    """Serve a list of all rows of a model, streaming it on a cache miss."""
+    content: Optional[bytes] = _response_cache.get(key)
+    if content is not None:
+        return _json_response(content)
+        
+    async def generate():
+        version = _cache_version
+        chunks: Optional[List[bytes]] = [b"["]
+        size = 1
+        first = True
+        yield b"["
+        try:
+            async with _stream_session(request) as db:
+                result = await db.stream(
+                    select(model)
+                    .options(_NO_LAZY_LOADS)
+                    .execution_options(yield_per=_STREAM_BATCH_SIZE)
+                )
+                async for rows in result.scalars().partitions():
+                    # Encode the batch as a list and drop its brackets
+                    chunk = adapter.dump_json(
+                        adapter.validate_python(rows, from_attributes=True)
+                    )[1:-1]
+                    if not first:
+                        chunk = b"," + chunk
+                    first = False
+                    if chunks is not None:
+                        size += len(chunk)
+                        if size > _STREAM_CACHE_MAX_BYTES:
+                            chunks = None
+                        else:
+                            chunks.append(chunk)
+                    yield chunk
+        except Exception as e:
+            # Headers are already sent; abort the response rather than
+            # closing the document over a truncated list
+            logger.exception(f"Failed to stream {key}", error=str(e))
+            raise
+        yield b"]"
+        if chunks is not None:
+            chunks.append(b"]")
+            _cache_store(key, version, b"".join(chunks))
+        
+    return StreamingResponse(generate(), media_type="application/json")
+
+async def _assign_to_user(db: AsyncSession, model, data_id: int, user_id: int, **values):
+    """Point a face/voice/device row at a user with one UPDATE ... RETURNING.
+    
+    The user id is resolved through a subquery, so the returned row is None
+    when the data row is missing and its user_id is None when the user is.
+    """
+    result = await db.execute(
+        update(model)
+        .where(model.id == data_id)
+        .values(
+            user_id=select(HAUser.id).where(HAUser.id == user_id).scalar_subquery(),
+            **values
+        )
+        .returning(model.user_id)
+        .execution_options(synchronize_session=False)
+    )
+    return result.first()
+
+@router.get(
+    "/users",
+    response_model=None,
+    responses={200: {"model": List[UserResponse]}}
+)
+async def get_users(db: AsyncSession = Depends(get_db)):
     """Get all users with their associated data."""
     try:
+        content = _response_cache.get("users")
+        if content is not None:
+            return _json_response(content)
+            
         logger.info("Fetching all users")
-        users = db.query(HAUser).all()
+        version = _cache_version
+        result = await db.execute(select(HAUser).options(*_USER_RELATIONSHIPS))
+        users = result.scalars().all()
         logger.info("Successfully fetched users", count=len(users))
-        return users
+        content = _users_adapter.dump_json(
+            _users_adapter.validate_python(users, from_attributes=True)
+        )
+        _cache_store("users", version, content)
+        return _json_response(content)
     except Exception as e:
-        logger.error(
+        logger.exception(
             "Failed to fetch users",
-            error=str(e),
-            traceback=traceback.format_exc()
+            error=str(e)
         )
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.post("/users", response_model=UserResponse)
-async def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     """Create a new user mapping."""
+    user_data = user.model_dump(exclude_unset=True)
     try:
-        logger.info(
-            "Creating new user",
-            user_data=user.dict(exclude_unset=True)
-        )
-        db_user = HAUser(**user.dict())
+        logger.info("Creating new user", user_data=user_data)
+        db_user = HAUser(**user_data)
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        _invalidate_cache()
+        # Load server defaults and the (empty) collections UserResponse needs
+        await db.refresh(
+            db_user,
+            ["created_at", "updated_at", "faces", "voices", "devices"]
+        )
         logger.info(
             "Successfully created user",
             user_id=db_user.id,
@@ -50,20 +187,19 @@ async def create_user(user: UserCreate, db: Session = Depends(get_db)):
         )
         return db_user
     except Exception as e:
-        logger.error(
+        logger.exception(
             "Failed to create user",
             error=str(e),
-            user_data=user.dict(exclude_unset=True),
-            traceback=traceback.format_exc()
+            user_data=user_data
         )
         raise HTTPException(status_code=500, detail="Failed to create user")
 
 @router.get("/users/{user_id}", response_model=UserResponse)
-async def get_user(user_id: int, db: Session = Depends(get_db)):
+async def get_user(user_id: int, db: AsyncSession = Depends(get_db)):
     """Get a specific user's details."""
     try:
         logger.info("Fetching user details", user_id=user_id)
-        user = db.query(HAUser).filter(HAUser.id == user_id).first()
+        user = await db.get(HAUser, user_id, options=_USER_RELATIONSHIPS)
         if not user:
             logger.warning("User not found", user_id=user_id)
             raise HTTPException(status_code=404, detail="User not found")
@@ -72,93 +208,93 @@ async def get_user(user_id: int, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(
+        logger.exception(
             "Failed to fetch user details",
             error=str(e),
-            user_id=user_id,
-            traceback=traceback.format_exc()
+            user_id=user_id
         )
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.put("/users/{user_id}", response_model=UserResponse)
-async def update_user(user_id: int, user: UserUpdate, db: Session = Depends(get_db)):
+async def update_user(user_id: int, user: UserUpdate, db: AsyncSession = Depends(get_db)):
     """Update a user's details."""
+    update_data = user.model_dump(exclude_unset=True)
     try:
-        logger.info(
-            "Updating user",
-            user_id=user_id,
-            update_data=user.dict(exclude_unset=True)
-        )
-        db_user = db.query(HAUser).filter(HAUser.id == user_id).first()
+        logger.info("Updating user", user_id=user_id, update_data=update_data)
+        db_user = await db.get(HAUser, user_id, options=_USER_RELATIONSHIPS)
         if not db_user:
             logger.warning("User not found for update", user_id=user_id)
             raise HTTPException(status_code=404, detail="User not found")
         
-        for key, value in user.dict(exclude_unset=True).items():
+        for key, value in update_data.items():
             setattr(db_user, key, value)
         
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        _invalidate_cache()
+        await db.refresh(db_user)
         logger.info("Successfully updated user", user_id=user_id)
         return db_user
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(
+        logger.exception(
             "Failed to update user",
             error=str(e),
             user_id=user_id,
-            update_data=user.dict(exclude_unset=True),
-            traceback=traceback.format_exc()
+            update_data=update_data
         )
         raise HTTPException(status_code=500, detail="Failed to update user")
 
 @router.delete("/users/{user_id}")
-async def delete_user(user_id: int, db: Session = Depends(get_db)):
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_db)):
     """Delete a user mapping."""
     try:
         logger.info("Deleting user", user_id=user_id)
-        user = db.query(HAUser).filter(HAUser.id == user_id).first()
+        # Collections are loaded so their foreign keys can be cleared
+        user = await db.get(HAUser, user_id, options=_USER_RELATIONSHIPS)
         if not user:
             logger.warning("User not found for deletion", user_id=user_id)
             raise HTTPException(status_code=404, detail="User not found")
         
-        db.delete(user)
-        db.commit()
+        await db.delete(user)
+        await db.commit()
+        _invalidate_cache()
         logger.info("Successfully deleted user", user_id=user_id)
         return {"message": "User deleted"}
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(
+        logger.exception(
             "Failed to delete user",
             error=str(e),
-            user_id=user_id,
-            traceback=traceback.format_exc()
+            user_id=user_id
         )
         raise HTTPException(status_code=500, detail="Failed to delete user")
 
-@router.get("/faces", response_model=List[FaceResponse])
-async def get_faces(db: Session = Depends(get_db)):
+@router.get(
+    "/faces",
+    response_model=None,
+    responses={200: {"model": List[FaceResponse]}}
+)
+async def get_faces(request: Request):
     """Get all face data."""
-    return db.query(Face).all()
+    return await _list_response(request, "faces", Face, _faces_adapter)
 
 @router.post("/faces/{face_id}/map")
-async def map_face(face_id: int, mapping: DataMapping, db: Session = Depends(get_db)):
+async def map_face(face_id: int, mapping: DataMapping, db: AsyncSession = Depends(get_db)):
     """Map a face to a user."""
+    mapping_data = mapping.model_dump(exclude_unset=True)
     try:
-        logger.info(
-            "Mapping face to user",
-            face_id=face_id,
-            mapping_data=mapping.dict(exclude_unset=True)
+        logger.info("Mapping face to user", face_id=face_id, mapping_data=mapping_data)
+        row = await _assign_to_user(
+            db, Face, face_id, mapping.user_id, confidence=mapping.confidence
         )
-        face = db.query(Face).filter(Face.id == face_id).first()
-        if not face:
+        if row is None:
             logger.warning("Face not found for mapping", face_id=face_id)
             raise HTTPException(status_code=404, detail="Face not found")
         
-        user = db.query(HAUser).filter(HAUser.id == mapping.user_id).first()
-        if not user:
+        if row.user_id is None:
+            await db.rollback()
             logger.warning(
                 "User not found for face mapping",
                 user_id=mapping.user_id,
@@ -166,9 +302,6 @@ async def map_face(face_id: int, mapping: DataMapping, db: Session = Depends(get
             )
             raise HTTPException(status_code=404, detail="User not found")
         
-        face.user_id = user.id
-        face.confidence = mapping.confidence
-        
         if mapping.feedback:
             feedback = TrainingFeedback(
                 data_type="face",
@@ -182,30 +315,30 @@ async def map_face(face_id: int, mapping: DataMapping, db: Session = Depends(get
                 feedback=mapping.feedback
             )
         
-        db.commit()
+        await db.commit()
+        _invalidate_cache()
         logger.info(
             "Successfully mapped face to user",
             face_id=face_id,
-            user_id=user.id,
+            user_id=mapping.user_id,
             confidence=mapping.confidence
         )
         return {"message": "Face mapped successfully"}
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(
+        logger.exception(
             "Failed to map face to user",
             error=str(e),
             face_id=face_id,
-            mapping_data=mapping.dict(exclude_unset=True),
-            traceback=traceback.format_exc()
+            mapping_data=mapping_data
         )
         raise HTTPException(status_code=500, detail="Failed to map face")
 
 @router.post("/faces/{face_id}/reject")
-async def reject_face(face_id: int, feedback: TrainingFeedbackCreate, db: Session = Depends(get_db)):
+async def reject_face(face_id: int, feedback: TrainingFeedbackCreate, db: AsyncSession = Depends(get_db)):
     """Mark a face as rejected for training purposes."""
-    face = db.query(Face).filter(Face.id == face_id).first()
+    face = await db.get(Face, face_id)
     if not face:
         raise HTTPException(status_code=404, detail="Face not found")
     
@@ -218,28 +351,30 @@ async def reject_face(face_id: int, feedback: TrainingFeedbackCreate, db: Sessio
     )
     db.add(feedback_entry)
     
-    db.commit()
+    await db.commit()
+    _invalidate_cache()
     return {"message": "Face rejected"}
 
-@router.get("/voices", response_model=List[VoiceResponse])
-async def get_voices(db: Session = Depends(get_db)):
+@router.get(
+    "/voices",
+    response_model=None,
+    responses={200: {"model": List[VoiceResponse]}}
+)
+async def get_voices(request: Request):
     """Get all voice data."""
-    return db.query(Voice).all()
+    return await _list_response(request, "voices", Voice, _voices_adapter)
 
 @router.post("/voices/{voice_id}/map")
-async def map_voice(voice_id: int, mapping: DataMapping, db: Session = Depends(get_db)):
+async def map_voice(voice_id: int, mapping: DataMapping, db: AsyncSession = Depends(get_db)):
     """Map a voice to a user."""
-    voice = db.query(Voice).filter(Voice.id == voice_id).first()
-    if not voice:
+    row = await _assign_to_user(db, Voice, voice_id, mapping.user_id, confidence=mapping.confidence)
+    if row is None:
         raise HTTPException(status_code=404, detail="Voice not found")
     
-    user = db.query(HAUser).filter(HAUser.id == mapping.user_id).first()
-    if not user:
+    if row.user_id is None:
+        await db.rollback()
         raise HTTPException(status_code=404, detail="User not found")
     
-    voice.user_id = user.id
-    voice.confidence = mapping.confidence
-    
     if mapping.feedback:
         feedback = TrainingFeedback(
             data_type="voice",
@@ -248,13 +383,14 @@ async def map_voice(voice_id: int, mapping: DataMapping, db: Session = Depends(g
         )
         db.add(feedback)
     
-    db.commit()
+    await db.commit()
+    _invalidate_cache()
     return {"message": "Voice mapped successfully"}
 
 @router.post("/voices/{voice_id}/reject")
-async def reject_voice(voice_id: int, feedback: TrainingFeedbackCreate, db: Session = Depends(get_db)):
+async def reject_voice(voice_id: int, feedback: TrainingFeedbackCreate, db: AsyncSession = Depends(get_db)):
     """Mark a voice as rejected for training purposes."""
-    voice = db.query(Voice).filter(Voice.id == voice_id).first()
+    voice = await db.get(Voice, voice_id)
     if not voice:
         raise HTTPException(status_code=404, detail="Voice not found")
     
@@ -267,27 +403,30 @@ async def reject_voice(voice_id: int, feedback: TrainingFeedbackCreate, db: Sess
     )
     db.add(feedback_entry)
     
-    db.commit()
+    await db.commit()
+    _invalidate_cache()
     return {"message": "Voice rejected"}
 
-@router.get("/devices", response_model=List[DeviceResponse])
-async def get_devices(db: Session = Depends(get_db)):
+@router.get(
+    "/devices",
+    response_model=None,
+    responses={200: {"model": List[DeviceResponse]}}
+)
+async def get_devices(request: Request):
     """Get all device data."""
-    return db.query(Device).all()
+    return await _list_response(request, "devices", Device, _devices_adapter)
 
 @router.post("/devices/{device_id}/map")
-async def map_device(device_id: int, mapping: DataMapping, db: Session = Depends(get_db)):
+async def map_device(device_id: int, mapping: DataMapping, db: AsyncSession = Depends(get_db)):
     """Map a device to a user."""
-    device = db.query(Device).filter(Device.id == device_id).first()
-    if not device:
+    row = await _assign_to_user(db, Device, device_id, mapping.user_id)
+    if row is None:
         raise HTTPException(status_code=404, detail="Device not found")
     
-    user = db.query(HAUser).filter(HAUser.id == mapping.user_id).first()
-    if not user:
+    if row.user_id is None:
+        await db.rollback()
         raise HTTPException(status_code=404, detail="User not found")
     
-    device.user_id = user.id
-    
     if mapping.feedback:
         feedback = TrainingFeedback(
             data_type="device",
@@ -296,16 +435,18 @@ async def map_device(device_id: int, mapping: DataMapping, db: Session = Depends
         )
         db.add(feedback)
     
-    db.commit()
+    await db.commit()
+    _invalidate_cache()
     return {"message": "Device mapped successfully"}
 
 @router.post("/devices/{device_id}/forget")
-async def forget_device(device_id: int, db: Session = Depends(get_db)):
+async def forget_device(device_id: int, db: AsyncSession = Depends(get_db)):
     """Remove a device from tracking."""
-    device = db.query(Device).filter(Device.id == device_id).first()
+    device = await db.get(Device, device_id)
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
     
-    db.delete(device)
-    db.commit()
+    await db.delete(device)
+    await db.commit()
+    _invalidate_cache()
     return {"message": "Device forgotten"} 
\ No newline at end of file
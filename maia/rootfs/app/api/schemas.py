@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl, computed_field
 from typing import Optional, List, Dict, Union
 from datetime import datetime
 
@@ -27,11 +27,11 @@ class FaceCreate(FaceBase):
 class FaceResponse(FaceBase):
     id: int
     user_id: Optional[int]
-    confidence_level: str
 
     class Config:
         orm_mode = True
 
+    @computed_field
     @property
     def confidence_level(self) -> str:
         if self.confidence >= 90:
@@ -53,11 +53,11 @@ class VoiceCreate(VoiceBase):
 class VoiceResponse(VoiceBase):
     id: int
     user_id: Optional[int]
-    confidence_level: str
 
     class Config:
         orm_mode = True
 
+    @computed_field
     @property
     def confidence_level(self) -> str:
         if self.confidence >= 90:
@@ -3,14 +3,18 @@ Automation engine for MAIA.
 """
 import asyncio
 import logging
-from typing import Dict, List, Optional, Any, Callable
-from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, Callable, Tuple
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-import json
+from pathlib import Path
+import os
+import sys
+import time
+import orjson
 from ..database.storage import CommandStorage
 from ..core.openai_integration import OpenAIIntegration
 
-@dataclass
+@dataclass(slots=True)
 class AutomationRule:
     """Automation rule definition."""
     id: str
@@ -21,8 +25,21 @@ class AutomationRule:
     actions: List[Dict[str, Any]]
     enabled: bool = True
     metadata: Optional[Dict[str, Any]] = None
+    _matcher: Optional[Callable[["AutomationEvent"], bool]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    # (condition type, handler argument) pairs, see _rebuild_index
+    _static_conditions: Tuple[Tuple[str, Any], ...] = field(
+        default=(), init=False, repr=False, compare=False
+    )
+    _dynamic_conditions: Tuple[Tuple[str, Any], ...] = field(
+        default=(), init=False, repr=False, compare=False
+    )
+    _costly_conditions: Tuple[Tuple[str, Any], ...] = field(
+        default=(), init=False, repr=False, compare=False
+    )
 
-@dataclass
+@dataclass(slots=True)
 class AutomationEvent:
     """Event that can trigger automations."""
     source: str
@@ -30,6 +47,49 @@ class AutomationEvent:
     data: Dict[str, Any]
     timestamp: datetime
 
+_MISSING = object()
+
+# Conditions above this cost are assumed to do I/O and are checked concurrently
+_CHEAP_CONDITION_COST = 1
+
+# asyncio.Task takes eager_start from Python 3.12
+_EAGER_START = sys.version_info >= (3, 12)
+
+def _compile_trigger(trigger: Dict[str, Any]) -> Callable[[AutomationEvent], bool]:
+    """Compile a trigger configuration into an event predicate."""
+    source = trigger.get("source")
+    event_type = trigger.get("event_type")
+    data_items = tuple((trigger.get("data") or {}).items())
+    
+    def matches(event: AutomationEvent) -> bool:
+        if source is not None and event.source != source:
+            return False
+        if event_type is not None and event.event_type != event_type:
+            return False
+        data = event.data
+        for key, value in data_items:
+            if data.get(key, _MISSING) != value:
+                return False
+        return True
+        
+    return matches
+
+def _read_rules_file(path: Path, known_mtime: Optional[int]) -> Optional[Tuple[int, Any]]:
+    """Read and parse rules file, or return None if mtime is unchanged."""
+    mtime = path.stat().st_mtime_ns
+    if mtime == known_mtime:
+        return None
+    return mtime, orjson.loads(path.read_bytes())
+
+def _write_rules_file(path: Path, content: bytes) -> int:
+    """Atomically replace rules file and return its new mtime."""
+    # Write to a temporary file and swap it in, so a crash mid-write
+    # never leaves a truncated rules file behind
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, path)
+    return path.stat().st_mtime_ns
+
 class AutomationEngine:
     """Engine for handling automation rules and execution."""
     
@@ -37,24 +97,60 @@ class AutomationEngine:
         self,
         command_storage: CommandStorage,
         openai_integration: OpenAIIntegration,
-        rules_file: str = "automation_rules.json"
+        rules_file: str = "automation_rules.json",
+        save_delay: float = 0.25,
+        num_workers: int = 4,
+        queue_size: int = 1024,
+        eager_tasks: bool = True
     ):
         """Initialize automation engine."""
         self.command_storage = command_storage
         self.openai_integration = openai_integration
         self.rules_file = rules_file
+        self._rules_mtime: Optional[int] = None
+        
+        # Rule changes are flushed to disk in batches after save_delay
+        self.save_delay = save_delay
+        self._rules_dirty = asyncio.Event()
+        self._save_task: Optional[asyncio.Task] = None
         self.logger = logging.getLogger(__name__)
         
         # Initialize storage
         self.rules: Dict[str, AutomationRule] = {}
-        self.event_handlers: Dict[str, List[Callable]] = {}
+        self.event_handlers: Dict[str, Tuple[Callable, ...]] = {}
         self.action_handlers: Dict[str, Callable] = {}
         self.condition_handlers: Dict[str, Callable] = {}
         
-        # Event processing
-        self.event_queue: asyncio.Queue[AutomationEvent] = asyncio.Queue()
-        self.processing_task: Optional[asyncio.Task] = None
+        # Static conditions don't depend on the event, so their results
+        # are shared between all events within the same one second tick
+        self._static_condition_types: set = set()
+        self._condition_costs: Dict[str, int] = {}
+        self._condition_preparers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self._static_results: Dict[int, bool] = {}
+        self._static_tick: Optional[int] = None
+        
+        # Rules bucketed by trigger (source, event_type); None matches any
+        self._trigger_index: Dict[Tuple[Optional[str], Optional[str]], List[AutomationRule]] = {}
+        
+        # Event processing; producers wait when the queue is full, and a
+        # pool of workers keeps one slow rule from stalling other events
+        self.num_workers = num_workers
+        self.event_queue: asyncio.Queue[AutomationEvent] = asyncio.Queue(maxsize=queue_size)
+        self.processing_tasks: List[asyncio.Task] = []
         self.is_running = False
+        # Only tasks the engine spawns itself start eagerly; the loop's
+        # task factory is left alone
+        self.eager_tasks = eager_tasks and _EAGER_START
+        
+    def _spawn(self, coro) -> asyncio.Future:
+        """Wrap a coroutine in a task for gather.
+        
+        Eagerly started tasks run their first step right away, so those
+        that finish without awaiting anything skip the ready queue.
+        """
+        if self.eager_tasks:
+            return asyncio.Task(coro, loop=asyncio.get_running_loop(), eager_start=True)
+        return asyncio.ensure_future(coro)
         
     async def start(self) -> None:
         """Start the automation engine."""
@@ -64,7 +160,11 @@ class AutomationEngine:
             
             # Start event processing
             self.is_running = True
-            self.processing_task = asyncio.create_task(self._process_events())
+            self.processing_tasks = [
+                asyncio.create_task(self._process_events())
+                for _ in range(self.num_workers)
+            ]
+            self._save_task = asyncio.create_task(self._flush_rules())
             
             self.logger.info("Automation engine started")
             
@@ -77,12 +177,23 @@ class AutomationEngine:
         try:
             self.is_running = False
             
-            if self.processing_task:
-                self.processing_task.cancel()
+            for task in self.processing_tasks:
+                task.cancel()
+            await asyncio.gather(*self.processing_tasks, return_exceptions=True)
+            self.processing_tasks = []
+            
+            if self._save_task:
+                self._save_task.cancel()
                 try:
-                    await self.processing_task
+                    await self._save_task
                 except asyncio.CancelledError:
                     pass
+                self._save_task = None
+                
+            # Flush rule changes that were still waiting for the writer
+            if self._rules_dirty.is_set():
+                self._rules_dirty.clear()
+                await self.save_rules()
                 
             self.logger.info("Automation engine stopped")
             
@@ -90,15 +201,26 @@ class AutomationEngine:
             self.logger.error(f"Error stopping automation engine: {str(e)}")
             
     async def load_rules(self) -> None:
-        """Load automation rules from file."""
+        """Load automation rules from file if it changed since last load."""
         try:
-            with open(self.rules_file, "r") as f:
-                rules_data = json.load(f)
+            # File access and parsing run in a thread to keep the loop free
+            loaded = await asyncio.to_thread(
+                _read_rules_file, Path(self.rules_file), self._rules_mtime
+            )
+            if loaded is None:
+                return
+                
+            mtime, rules_data = loaded
+            if isinstance(rules_data, dict):
+                # Shipped rules files wrap the list in a "rules" key
+                rules_data = rules_data.get("rules", [])
                 
             self.rules.clear()
             for rule_data in rules_data:
                 rule = AutomationRule(**rule_data)
                 self.rules[rule.id] = rule
+            self._rebuild_index()
+            self._rules_mtime = mtime
                 
             self.logger.info(f"Loaded {len(self.rules)} automation rules")
             
@@ -125,23 +247,42 @@ class AutomationEngine:
                 for rule in self.rules.values()
             ]
             
-            with open(self.rules_file, "w") as f:
-                json.dump(rules_data, f, indent=2)
+            self._rules_mtime = await asyncio.to_thread(
+                _write_rules_file,
+                Path(self.rules_file),
+                orjson.dumps(rules_data, option=orjson.OPT_INDENT_2)
+            )
                 
             self.logger.info(f"Saved {len(self.rules)} automation rules")
             
         except Exception as e:
             self.logger.error(f"Error saving rules: {str(e)}")
             
+    async def _request_save(self) -> None:
+        """Schedule a rules save, coalescing changes made in quick succession."""
+        if self._save_task:
+            self._rules_dirty.set()
+        else:
+            # Engine not running, nothing would flush a deferred save
+            await self.save_rules()
+            
+    async def _flush_rules(self) -> None:
+        """Background task writing rule changes to disk."""
+        while True:
+            await self._rules_dirty.wait()
+            await asyncio.sleep(self.save_delay)
+            # Clear before saving so changes made during the write are kept
+            self._rules_dirty.clear()
+            await self.save_rules()
+            
     def register_event_handler(
         self,
         event_type: str,
         handler: Callable[[AutomationEvent], None]
     ) -> None:
         """Register a handler for a specific event type."""
-        if event_type not in self.event_handlers:
-            self.event_handlers[event_type] = []
-        self.event_handlers[event_type].append(handler)
+        # Rebind a new tuple so workers iterating the old one are unaffected
+        self.event_handlers[event_type] = self.event_handlers.get(event_type, ()) + (handler,)
         
     def register_action_handler(
         self,
@@ -154,10 +295,39 @@ class AutomationEngine:
     def register_condition_handler(
         self,
         condition_type: str,
-        handler: Callable[[Dict[str, Any]], bool]
+        handler: Callable[[Dict[str, Any]], bool],
+        is_static: Optional[bool] = None,
+        cost: Optional[int] = None,
+        prepare: Optional[Callable[[Dict[str, Any]], Any]] = None
     ) -> None:
-        """Register a handler for a specific condition type."""
+        """Register a handler for a specific condition type.
+        
+        Static handlers only look at the condition and current state, never
+        the event, so their results may be reused for up to a second. Cost
+        is a rough estimate used to check cheap conditions first. If given,
+        prepare converts each condition once when rules are indexed and the
+        handler receives its result instead of the condition dict. is_static,
+        cost and prepare default to the handler's own attributes of those
+        names.
+        """
+        prepare = prepare or getattr(handler, "prepare", None)
+        if is_static is None:
+            is_static = getattr(handler, "is_static", False)
+        if cost is None:
+            cost = getattr(handler, "cost", _CHEAP_CONDITION_COST)
         self.condition_handlers[condition_type] = handler
+        self._condition_costs[condition_type] = cost
+        if prepare:
+            self._condition_preparers[condition_type] = prepare
+        else:
+            self._condition_preparers.pop(condition_type, None)
+        if is_static:
+            self._static_condition_types.add(condition_type)
+        else:
+            self._static_condition_types.discard(condition_type)
+        if self.rules:
+            # Re-partition conditions of already loaded rules
+            self._rebuild_index()
         
     async def add_rule(self, rule: AutomationRule) -> bool:
         """Add a new automation rule."""
@@ -167,7 +337,8 @@ class AutomationEngine:
                 return False
                 
             self.rules[rule.id] = rule
-            await self.save_rules()
+            self._rebuild_index()
+            await self._request_save()
             return True
             
         except Exception as e:
@@ -182,7 +353,8 @@ class AutomationEngine:
                 return False
                 
             self.rules[rule.id] = rule
-            await self.save_rules()
+            self._rebuild_index()
+            await self._request_save()
             return True
             
         except Exception as e:
@@ -197,7 +369,8 @@ class AutomationEngine:
                 return False
                 
             del self.rules[rule_id]
-            await self.save_rules()
+            self._rebuild_index()
+            await self._request_save()
             return True
             
         except Exception as e:
@@ -205,22 +378,10 @@ class AutomationEngine:
             return False
             
     async def process_event(self, event: AutomationEvent) -> None:
-        """Process an automation event."""
+        """Queue an automation event for the workers."""
         try:
-            # Add event to queue
             await self.event_queue.put(event)
             
-            # Notify event handlers
-            if event.event_type in self.event_handlers:
-                for handler in self.event_handlers[event.event_type]:
-                    try:
-                        await handler(event)
-                    except Exception as e:
-                        self.logger.error(
-                            f"Error in event handler: {str(e)}",
-                            extra={"event": event}
-                        )
-                        
         except Exception as e:
             self.logger.error(f"Error processing event: {str(e)}")
             
@@ -231,21 +392,27 @@ class AutomationEngine:
                 # Get next event
                 event = await self.event_queue.get()
                 
-                # Check each rule
-                for rule in self.rules.values():
-                    if not rule.enabled:
-                        continue
-                        
-                    # Check if event matches trigger
-                    if not self._matches_trigger(event, rule.trigger):
-                        continue
-                        
-                    # Check conditions
-                    if not await self._check_conditions(rule.conditions, event):
-                        continue
+                # Notify event handlers
+                for handler in self.event_handlers.get(event.event_type, ()):
+                    try:
+                        await handler(event)
+                    except Exception as e:
+                        self.logger.error(
+                            f"Error in event handler: {str(e)}",
+                            extra={"event": event}
+                        )
                         
-                    # Execute actions
-                    await self._execute_actions(rule.actions, event)
+                # Evaluate candidate rules concurrently so slow conditions overlap
+                rules = self._candidate_rules(event)
+                results = await asyncio.gather(
+                    *(self._spawn(self._evaluate_rule(rule, event)) for rule in rules),
+                    return_exceptions=True
+                )
+                for rule, result in zip(rules, results):
+                    if isinstance(result, Exception):
+                        self.logger.error(
+                            f"Error evaluating rule {rule.id}: {str(result)}"
+                        )
                     
             except asyncio.CancelledError:
                 break
@@ -254,49 +421,112 @@ class AutomationEngine:
                 self.logger.error(f"Error in event processing loop: {str(e)}")
                 await asyncio.sleep(1)
                 
-    def _matches_trigger(self, event: AutomationEvent, trigger: Dict[str, Any]) -> bool:
-        """Check if event matches trigger configuration."""
-        try:
-            # Check source
-            if "source" in trigger and trigger["source"] != event.source:
-                return False
-                
-            # Check event type
-            if "event_type" in trigger and trigger["event_type"] != event.event_type:
-                return False
-                
-            # Check data conditions
-            if "data" in trigger:
-                for key, value in trigger["data"].items():
-                    if key not in event.data or event.data[key] != value:
-                        return False
-                        
-            return True
+    def _rebuild_index(self) -> None:
+        """Rebuild the trigger index after the rule set changed."""
+        index: Dict[Tuple[Optional[str], Optional[str]], List[AutomationRule]] = {}
+        static_types = self._static_condition_types
+        costs = self._condition_costs
+        preparers = self._condition_preparers
+        for rule in self.rules.values():
+            rule._matcher = _compile_trigger(rule.trigger)
+            static = []
+            dynamic = []
+            costly = []
+            for condition in sorted(
+                (c for c in rule.conditions if c.get("type")),
+                key=lambda c: costs.get(c["type"], _CHEAP_CONDITION_COST)
+            ):
+                condition_type = condition["type"]
+                prepare = preparers.get(condition_type)
+                entry = (condition_type, prepare(condition) if prepare else condition)
+                if condition_type in static_types:
+                    static.append(entry)
+                elif costs.get(condition_type, _CHEAP_CONDITION_COST) > _CHEAP_CONDITION_COST:
+                    costly.append(entry)
+                else:
+                    dynamic.append(entry)
+            rule._static_conditions = tuple(static)
+            rule._dynamic_conditions = tuple(dynamic)
+            rule._costly_conditions = tuple(costly)
+            key = (rule.trigger.get("source"), rule.trigger.get("event_type"))
+            index.setdefault(key, []).append(rule)
+        self._trigger_index = index
+        # Cached results are keyed by condition identity
+        self._static_results = {}
+        
+    def _candidate_rules(self, event: AutomationEvent) -> List[AutomationRule]:
+        """Get rules whose trigger source and event type can match event."""
+        index = self._trigger_index
+        candidates: List[AutomationRule] = []
+        for key in (
+            (event.source, event.event_type),
+            (None, event.event_type),
+            (event.source, None),
+            (None, None)
+        ):
+            bucket = index.get(key)
+            if bucket:
+                candidates.extend(bucket)
+        return candidates
+        
+    async def _evaluate_rule(self, rule: AutomationRule, event: AutomationEvent) -> None:
+        """Check a rule against an event and run its actions if it applies."""
+        if not rule.enabled:
+            return
             
-        except Exception as e:
-            self.logger.error(f"Error matching trigger: {str(e)}")
-            return False
+        # Check if event matches trigger
+        if not rule._matcher(event):
+            return
+            
+        # Check conditions
+        if not await self._check_conditions(rule, event):
+            return
             
+        # Execute actions
+        await self._execute_actions(rule.actions, event)
+        
     async def _check_conditions(
         self,
-        conditions: List[Dict[str, Any]],
+        rule: AutomationRule,
         event: AutomationEvent
     ) -> bool:
-        """Check if all conditions are met."""
+        """Check if all conditions are met, static and cheap ones first."""
         try:
-            for condition in conditions:
-                condition_type = condition.get("type")
-                if not condition_type:
-                    continue
-                    
-                if condition_type not in self.condition_handlers:
+            handlers = self.condition_handlers
+            if rule._static_conditions:
+                tick = int(time.monotonic())
+                if tick != self._static_tick:
+                    self._static_tick = tick
+                    self._static_results = {}
+                results = self._static_results
+                
+                for entry in rule._static_conditions:
+                    # Keyed by entry; prepared arguments need not be unique
+                    result = results.get(id(entry))
+                    if result is None:
+                        condition_type, argument = entry
+                        result = results[id(entry)] = bool(
+                            await handlers[condition_type](argument)
+                        )
+                    if not result:
+                        return False
+                        
+            for condition_type, argument in rule._dynamic_conditions:
+                if condition_type not in handlers:
                     self.logger.warning(f"No handler for condition type: {condition_type}")
                     return False
                     
-                handler = self.condition_handlers[condition_type]
-                if not await handler(condition):
+                if not await handlers[condition_type](argument):
                     return False
                     
+            # Cheap checks passed, let the expensive ones overlap
+            if rule._costly_conditions:
+                checks = await asyncio.gather(*(
+                    self._spawn(handlers[condition_type](argument))
+                    for condition_type, argument in rule._costly_conditions
+                ))
+                return all(checks)
+                
             return True
             
         except Exception as e:
@@ -1,67 +1,213 @@
 """
 Event and action handlers for the automation engine.
 """
+import asyncio
 import logging
-from typing import Dict, Any, Optional
-from datetime import datetime, time
-import aiohttp
+from typing import Dict, Any, Optional, Set, Coroutine, Tuple, Callable, Union
+from datetime import datetime, time, timezone
+from functools import lru_cache, wraps
+from dataclasses import dataclass
+from time import monotonic, time as epoch_time
 from .automation_engine import AutomationEvent
-from .ha_integration import HomeAssistantIntegration
+from .ha_integration import HomeAssistantIntegration, entity_domain
 
 _LOGGER = logging.getLogger(__name__)
 
+# Condition cost hint for handlers that may fetch Home Assistant state;
+# anything above 1 is checked after the cheap conditions, concurrently
+_HA_STATE_COST = 10
+
 # Initialize Home Assistant integration
 ha_integration: Optional[HomeAssistantIntegration] = None
 
+# Sensor updates still in flight; holding them keeps them from being
+# garbage collected before they finish
+_pending_updates: Set[asyncio.Task] = set()
+
+def _schedule_update(update: Coroutine) -> None:
+    """Run a sensor update in the background without awaiting it."""
+    task = asyncio.create_task(update)
+    _pending_updates.add(task)
+    task.add_done_callback(_pending_updates.discard)
+
+# Device tracker attributes waiting to be written. Updates for a device
+# arriving within _TRACKER_DELAY are merged into a single write.
+_TRACKER_DELAY = 0.15
+_pending_trackers: Dict[str, Dict[str, Any]] = {}
+_tracker_timers: Dict[str, asyncio.TimerHandle] = {}
+
+def _update_tracker(device_id: str, attributes: Dict[str, Any]) -> None:
+    """Queue a device tracker update, merging it with pending ones."""
+    pending = _pending_trackers.get(device_id)
+    if pending is None:
+        _pending_trackers[device_id] = attributes
+    else:
+        pending.update(attributes)
+    # Flush at the end of a fixed window rather than restarting the timer,
+    # so a device reporting continuously is still written regularly
+    if device_id not in _tracker_timers:
+        _tracker_timers[device_id] = asyncio.get_running_loop().call_later(
+            _TRACKER_DELAY, _flush_tracker, device_id
+        )
+
+def _flush_tracker(device_id: str) -> None:
+    """Write the merged pending attributes of a device tracker."""
+    _tracker_timers.pop(device_id, None)
+    attributes = _pending_trackers.pop(device_id, None)
+    if attributes and ha_integration:
+        _schedule_update(ha_integration.set_value(
+            _device_tracker_id(device_id),
+            "home",
+            attributes
+        ))
+
 def init_ha_integration(
     host: str,
     token: str,
     port: int = 8123,
-    use_ssl: bool = False
+    use_ssl: bool = False,
+    connection_limit: int = 100
 ) -> None:
-    """Initialize Home Assistant integration."""
+    """Initialize Home Assistant integration.
+    
+    The integration opens one pooled session, shared by all handlers, when
+    it is started. connection_limit caps that pool and may be raised (up to
+    4096) for large installations.
+    """
     global ha_integration
     ha_integration = HomeAssistantIntegration(
         host=host,
         token=token,
         port=port,
-        use_ssl=use_ssl
+        use_ssl=use_ssl,
+        connection_limit=connection_limit
     )
 
+async def close_ha_integration() -> None:
+    """Stop Home Assistant integration and close its session."""
+    global ha_integration
+    for device_id, timer in list(_tracker_timers.items()):
+        timer.cancel()
+        _flush_tracker(device_id)
+    if _pending_updates:
+        await asyncio.gather(*_pending_updates, return_exceptions=True)
+    if ha_integration:
+        await ha_integration.stop()
+        ha_integration = None
+    _state_cache.clear()
+
+# Entity states are reused for a short while, so rules checked for the
+# same event share one lookup per entity instead of one each
+_STATE_TTL = 0.25
+_state_cache: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+_state_requests: Dict[str, asyncio.Task] = {}
+
+def _store_state(entity_id: str, request: asyncio.Task) -> None:
+    """Cache the result of a finished state lookup."""
+    _state_requests.pop(entity_id, None)
+    if not request.cancelled() and request.exception() is None:
+        _state_cache[entity_id] = (monotonic(), request.result())
+
+async def _cached_state(entity_id: str) -> Optional[Dict[str, Any]]:
+    """Get entity state, joining a lookup already in flight."""
+    cached = _state_cache.get(entity_id)
+    if cached and monotonic() - cached[0] < _STATE_TTL:
+        return cached[1]
+        
+    request = _state_requests.get(entity_id)
+    if request is None:
+        request = asyncio.create_task(ha_integration.get_state(entity_id))
+        _state_requests[entity_id] = request
+        request.add_done_callback(lambda task: _store_state(entity_id, task))
+    # Shielded so one cancelled caller doesn't cancel the others' lookup
+    return await asyncio.shield(request)
+
+# Sensor timestamps have one second resolution, so the formatted string
+# is only rebuilt when the second changes
+_iso_second = -1
+_iso_value = ""
+
+def _now_iso() -> str:
+    """Get the current UTC time as an ISO 8601 string."""
+    global _iso_second, _iso_value
+    second = int(epoch_time())
+    if second != _iso_second:
+        _iso_value = datetime.fromtimestamp(second, timezone.utc).isoformat()
+        _iso_second = second
+    return _iso_value
+
+@lru_cache(maxsize=256)
+def _presence_sensor_id(name: str) -> str:
+    """Get the presence sensor entity id for a person.
+    
+    Recognition events carry the lowercased, interned name as name_lc;
+    keying on it shares one cache entry per person.
+    """
+    return f"binary_sensor.presence_{name.lower()}"
+
+@lru_cache(maxsize=1024)
+def _device_tracker_id(device_id: str) -> str:
+    """Get the device tracker entity id for a device."""
+    return f"device_tracker.{device_id}"
+
+@lru_cache(maxsize=256)
+def _parse_time_range(start: str, end: str) -> Tuple[time, time, bool]:
+    """Parse time condition bounds and whether the range wraps midnight."""
+    start_time = time.fromisoformat(start)
+    end_time = time.fromisoformat(end)
+    return start_time, end_time, start_time > end_time
+
+def _safe_handler(handler: Callable[..., Coroutine]) -> Callable[..., Coroutine]:
+    """Log and swallow errors raised by an event or action handler."""
+    @wraps(handler)
+    async def wrapper(*args: Any, **kwargs: Any) -> None:
+        try:
+            await handler(*args, **kwargs)
+        except Exception:
+            _LOGGER.exception("Error in %s", handler.__name__)
+    return wrapper
+
 # Event handlers
+@_safe_handler
 async def handle_face_detection(event: AutomationEvent) -> None:
     """Handle face detection events."""
-    try:
-        face_data = event.data.get("face", {})
+    # Nothing to update or log
+    if ha_integration is None and not _LOGGER.isEnabledFor(logging.INFO):
+        return
+        
+    face_data = event.data.get("face", {})
+    bbox = face_data.get("bbox")
+    confidence = face_data.get("confidence", 0.0)
+    
+    if _LOGGER.isEnabledFor(logging.INFO):
         _LOGGER.info(
-            f"Face detected",
+            "Face detected",
             extra={
-                "bbox": face_data.get("bbox"),
-                "confidence": face_data.get("confidence")
+                "bbox": bbox,
+                "confidence": confidence
             }
         )
-        
-        # Update presence sensor if configured
-        if ha_integration:
-            await ha_integration.set_value(
-                "binary_sensor.face_detected",
-                True,
-                {
-                    "confidence": face_data.get("confidence", 0.0),
-                    "bbox": face_data.get("bbox")
-                }
-            )
-        
-    except Exception as e:
-        _LOGGER.error(f"Error handling face detection: {str(e)}")
+    
+    # Update presence sensor if configured
+    if ha_integration:
+        _schedule_update(ha_integration.set_value(
+            "binary_sensor.face_detected",
+            True,
+            {"confidence": confidence, "bbox": bbox}
+        ))
 
+@_safe_handler
 async def handle_face_recognition(event: AutomationEvent) -> None:
     """Handle face recognition events."""
-    try:
-        face_data = event.data.get("face", {})
-        name = face_data.get("name", "unknown")
-        confidence = face_data.get("confidence", 0.0)
+    # Nothing to update or log
+    if ha_integration is None and not _LOGGER.isEnabledFor(logging.INFO):
+        return
         
+    face_data = event.data.get("face", {})
+    name = face_data.get("name", "unknown")
+    confidence = face_data.get("confidence", 0.0)
+    
+    if _LOGGER.isEnabledFor(logging.INFO):
         _LOGGER.info(
             f"Face recognized: {name}",
             extra={
@@ -70,125 +216,129 @@ async def handle_face_recognition(event: AutomationEvent) -> None:
                 "bbox": face_data.get("bbox")
             }
         )
+    
+    # Update presence sensors if configured
+    if ha_integration:
+        # Both sensors report the same moment
+        now_iso = _now_iso()
         
-        # Update presence sensors if configured
-        if ha_integration:
+        _schedule_update(ha_integration.set_values([
             # Update person presence
-            await ha_integration.set_value(
-                f"binary_sensor.presence_{name.lower()}",
+            (
+                _presence_sensor_id(face_data.get("name_lc", name)),
                 True,
                 {
                     "confidence": confidence,
-                    "last_seen": datetime.now().isoformat()
+                    "last_seen": now_iso
                 }
-            )
-            
+            ),
             # Update last recognized face
-            await ha_integration.set_value(
+            (
                 "sensor.last_recognized_face",
                 name,
                 {
                     "confidence": confidence,
-                    "timestamp": datetime.now().isoformat()
+                    "timestamp": now_iso
                 }
             )
-        
-    except Exception as e:
-        _LOGGER.error(f"Error handling face recognition: {str(e)}")
+        ]))
 
+@_safe_handler
 async def handle_voice_command(event: AutomationEvent) -> None:
     """Handle voice command events."""
-    try:
-        command_data = event.data.get("command", {})
-        text = command_data.get("text", "")
-        intent = command_data.get("intent", "")
+    # Nothing to update or log
+    if ha_integration is None and not _LOGGER.isEnabledFor(logging.INFO):
+        return
         
+    command_data = event.data.get("command", {})
+    text = command_data.get("text", "")
+    intent = command_data.get("intent", "")
+    slots = command_data.get("slots", {})
+    
+    if _LOGGER.isEnabledFor(logging.INFO):
         _LOGGER.info(
-            f"Voice command received",
+            "Voice command received",
             extra={
                 "text": text,
                 "intent": intent,
-                "slots": command_data.get("slots", {})
+                "slots": slots
             }
         )
-        
-        # Update voice command sensor if configured
-        if ha_integration:
-            await ha_integration.set_value(
-                "sensor.last_voice_command",
-                text,
-                {
-                    "intent": intent,
-                    "slots": command_data.get("slots", {}),
-                    "timestamp": datetime.now().isoformat()
-                }
-            )
-        
-    except Exception as e:
-        _LOGGER.error(f"Error handling voice command: {str(e)}")
+    
+    # Update voice command sensor if configured
+    if ha_integration:
+        _schedule_update(ha_integration.set_value(
+            "sensor.last_voice_command",
+            text,
+            {
+                "intent": intent,
+                "slots": slots,
+                "timestamp": _now_iso()
+            }
+        ))
 
+@_safe_handler
 async def handle_device_detection(event: AutomationEvent) -> None:
     """Handle device detection events."""
-    try:
-        device_data = event.data.get("device", {})
-        device_id = device_data.get("id")
-        rssi = device_data.get("rssi")
+    # Nothing to update or log
+    if ha_integration is None and not _LOGGER.isEnabledFor(logging.INFO):
+        return
         
+    device_data = event.data.get("device", {})
+    device_id = device_data.get("id")
+    rssi = device_data.get("rssi")
+    scanner_id = device_data.get("scanner_id")
+    
+    if _LOGGER.isEnabledFor(logging.INFO):
         _LOGGER.info(
-            f"Device detected",
+            "Device detected",
             extra={
                 "device_id": device_id,
                 "rssi": rssi,
-                "scanner_id": device_data.get("scanner_id")
+                "scanner_id": scanner_id
             }
         )
-        
-        # Update device tracker if configured
-        if ha_integration and device_id:
-            await ha_integration.set_value(
-                f"device_tracker.{device_id}",
-                "home",
-                {
-                    "rssi": rssi,
-                    "scanner_id": device_data.get("scanner_id"),
-                    "last_seen": datetime.now().isoformat()
-                }
-            )
-        
-    except Exception as e:
-        _LOGGER.error(f"Error handling device detection: {str(e)}")
+    
+    # Update device tracker if configured
+    if ha_integration and device_id:
+        _update_tracker(device_id, {
+            "rssi": rssi,
+            "scanner_id": scanner_id,
+            "last_seen": _now_iso()
+        })
 
+@_safe_handler
 async def handle_position_update(event: AutomationEvent) -> None:
     """Handle device position update events."""
-    try:
-        position_data = event.data.get("position", {})
-        device_id = position_data.get("device_id")
+    # Nothing to update or log
+    if ha_integration is None and not _LOGGER.isEnabledFor(logging.INFO):
+        return
         
+    position_data = event.data.get("position", {})
+    device_id = position_data.get("device_id")
+    latitude = position_data.get("latitude")
+    longitude = position_data.get("longitude")
+    accuracy = position_data.get("accuracy")
+    
+    if _LOGGER.isEnabledFor(logging.INFO):
         _LOGGER.info(
-            f"Device position updated",
+            "Device position updated",
             extra={
                 "device_id": device_id,
-                "latitude": position_data.get("latitude"),
-                "longitude": position_data.get("longitude"),
-                "accuracy": position_data.get("accuracy")
+                "latitude": latitude,
+                "longitude": longitude,
+                "accuracy": accuracy
             }
         )
-        
-        # Update device tracker if configured
-        if ha_integration and device_id:
-            await ha_integration.set_value(
-                f"device_tracker.{device_id}",
-                "home",
-                {
-                    "latitude": position_data.get("latitude"),
-                    "longitude": position_data.get("longitude"),
-                    "accuracy": position_data.get("accuracy"),
-                    "last_update": datetime.now().isoformat()
-                }
-            )
-        
-    except Exception as e:
-        _LOGGER.error(f"Error handling position update: {str(e)}")
+    
+    # Update device tracker if configured
+    if ha_integration and device_id:
+        _update_tracker(device_id, {
+            "latitude": latitude,
+            "longitude": longitude,
+            "accuracy": accuracy,
+            "last_update": _now_iso()
+        })
 
 # Condition handlers
 async def check_time_condition(condition: Dict[str, Any]) -> bool:
@@ -197,11 +347,13 @@ async def check_time_condition(condition: Dict[str, Any]) -> bool:
         current_time = datetime.now().time()
         
         # Get time ranges
-        start_time = time.fromisoformat(condition.get("start_time", "00:00:00"))
-        end_time = time.fromisoformat(condition.get("end_time", "23:59:59"))
+        start_time, end_time, overnight = _parse_time_range(
+            condition.get("start_time", "00:00:00"),
+            condition.get("end_time", "23:59:59")
+        )
         
         # Check if current time is within range
-        if start_time <= end_time:
+        if not overnight:
             return start_time <= current_time <= end_time
         else:
             # Handle overnight ranges
@@ -211,128 +363,166 @@ async def check_time_condition(condition: Dict[str, Any]) -> bool:
         _LOGGER.error(f"Error checking time condition: {str(e)}")
         return False
 
-async def check_presence_condition(condition: Dict[str, Any]) -> bool:
-    """Check if presence condition is met."""
+@dataclass(slots=True, frozen=True)
+class PresenceCondition:
+    """Presence condition validated when rules are loaded."""
+    sensor_id: str
+    required: bool
+
+@dataclass(slots=True, frozen=True)
+class DeviceStateCondition:
+    """Device state condition validated when rules are loaded."""
+    entity_id: str
+    state: Any
+
+def prepare_presence_condition(condition: Dict[str, Any]) -> Optional[PresenceCondition]:
+    """Convert a presence condition, or return None if it is incomplete."""
+    person_name = condition.get("person")
+    if not person_name:
+        return None
+    return PresenceCondition(
+        sensor_id=_presence_sensor_id(person_name),
+        required=condition.get("presence", True)
+    )
+
+def prepare_device_condition(condition: Dict[str, Any]) -> Optional[DeviceStateCondition]:
+    """Convert a device condition, or return None if it is incomplete."""
+    device_id = condition.get("device_id")
+    required_state = condition.get("state")
+    if not device_id or required_state is None:
+        return None
+    return DeviceStateCondition(entity_id=device_id, state=required_state)
+
+async def check_presence_condition(
+    condition: Union[PresenceCondition, Dict[str, Any], None]
+) -> bool:
+    """Check if presence condition is met.
+    
+    Takes the prepared condition; a raw condition dict is converted here.
+    """
     try:
-        required_presence = condition.get("presence", True)
-        person_name = condition.get("person")
-        
-        if not person_name or not ha_integration:
+        if isinstance(condition, dict):
+            condition = prepare_presence_condition(condition)
+        if condition is None or not ha_integration:
             return False
             
         # Check presence sensor
-        sensor_id = f"binary_sensor.presence_{person_name.lower()}"
-        state = await ha_integration.get_state(sensor_id)
-        
+        state = await _cached_state(condition.sensor_id)
         if not state:
             return False
             
-        current_presence = state.get("state") == "on"
-        return current_presence == required_presence
+        return (state.get("state") == "on") == condition.required
         
     except Exception as e:
         _LOGGER.error(f"Error checking presence condition: {str(e)}")
         return False
 
-async def check_device_condition(condition: Dict[str, Any]) -> bool:
-    """Check if device condition is met."""
+async def check_device_condition(
+    condition: Union[DeviceStateCondition, Dict[str, Any], None]
+) -> bool:
+    """Check if device condition is met.
+    
+    Takes the prepared condition; a raw condition dict is converted here.
+    """
     try:
-        device_id = condition.get("device_id")
-        required_state = condition.get("state")
-        
-        if not device_id or required_state is None or not ha_integration:
+        if isinstance(condition, dict):
+            condition = prepare_device_condition(condition)
+        if condition is None or not ha_integration:
             return False
             
         # Get device state
-        state = await ha_integration.get_state(device_id)
+        state = await _cached_state(condition.entity_id)
         if not state:
             return False
             
-        return state.get("state") == required_state
+        return state.get("state") == condition.state
         
     except Exception as e:
         _LOGGER.error(f"Error checking device condition: {str(e)}")
         return False
 
+# Picked up by AutomationEngine.register_condition_handler
+check_time_condition.is_static = True
+check_presence_condition.prepare = prepare_presence_condition
+check_presence_condition.cost = _HA_STATE_COST
+check_device_condition.prepare = prepare_device_condition
+check_device_condition.cost = _HA_STATE_COST
+
 # Action handlers
+@_safe_handler
 async def handle_notification_action(action: Dict[str, Any]) -> None:
     """Handle notification actions."""
-    try:
-        message = action.get("message")
-        target = action.get("target", "all")
+    message = action.get("message")
+    target = action.get("target", "all")
+    
+    if not message or not ha_integration:
+        return
         
-        if not message or not ha_integration:
-            return
-            
-        if target == "voice":
-            # Use TTS service
-            await ha_integration.call_service(
-                "tts",
-                "speak",
-                {"entity_id": "media_player.maia_speaker"},
-                {"message": message}
-            )
-        else:
-            # Use notification service
-            await ha_integration.call_service(
-                "notify",
-                "notify",
-                {},
-                {"message": message, "target": target}
-            )
-        
-    except Exception as e:
-        _LOGGER.error(f"Error handling notification action: {str(e)}")
+    if target == "voice":
+        # Use TTS service
+        await ha_integration.call_service(
+            "tts",
+            "speak",
+            {"entity_id": "media_player.maia_speaker"},
+            {"message": message}
+        )
+    else:
+        # Use notification service
+        await ha_integration.call_service(
+            "notify",
+            "notify",
+            {},
+            {"message": message, "target": target}
+        )
 
+# Device commands taking just the entity id and service data
+_DEVICE_COMMANDS: Dict[str, Callable[..., Coroutine]] = {
+    "turn_on": HomeAssistantIntegration.turn_on,
+    "turn_off": HomeAssistantIntegration.turn_off,
+    "toggle": HomeAssistantIntegration.toggle,
+}
+
+@_safe_handler
 async def handle_device_control_action(action: Dict[str, Any]) -> None:
     """Handle device control actions."""
-    try:
-        device_id = action.get("device_id")
-        command = action.get("command")
-        parameters = action.get("parameters", {})
+    device_id = action.get("device_id")
+    command = action.get("command")
+    # Copied, set_value and play_media pop their arguments out of it
+    parameters = dict(action.get("parameters") or {})
+    
+    if not device_id or not command or not ha_integration:
+        return
         
-        if not device_id or not command or not ha_integration:
-            return
-            
-        # Execute command
-        if command == "turn_on":
-            await ha_integration.turn_on(device_id, parameters)
-        elif command == "turn_off":
-            await ha_integration.turn_off(device_id, parameters)
-        elif command == "toggle":
-            await ha_integration.toggle(device_id, parameters)
-        elif command == "set_value":
-            value = parameters.pop("value", None)
-            if value is not None:
-                await ha_integration.set_value(device_id, value, parameters)
-        elif command == "play_media":
-            media_id = parameters.pop("media_content_id", None)
-            media_type = parameters.pop("media_content_type", None)
-            if media_id and media_type:
-                await ha_integration.play_media(
-                    device_id,
-                    media_id,
-                    media_type,
-                    parameters
-                )
-        
-    except Exception as e:
-        _LOGGER.error(f"Error handling device control action: {str(e)}")
+    # Execute command
+    simple_command = _DEVICE_COMMANDS.get(command)
+    if simple_command:
+        await simple_command(ha_integration, device_id, parameters)
+    elif command == "set_value":
+        value = parameters.pop("value", None)
+        if value is not None:
+            await ha_integration.set_value(device_id, value, parameters)
+    elif command == "play_media":
+        media_id = parameters.pop("media_content_id", None)
+        media_type = parameters.pop("media_content_type", None)
+        if media_id and media_type:
+            await ha_integration.play_media(
+                device_id,
+                media_id,
+                media_type,
+                parameters
+            )
 
+@_safe_handler
 async def handle_scene_activation_action(action: Dict[str, Any]) -> None:
     """Handle scene activation actions."""
-    try:
-        scene_id = action.get("scene_id")
-        transition = action.get("transition", 0)
+    scene_id = action.get("scene_id")
+    transition = action.get("transition", 0)
+    
+    if not scene_id or not ha_integration:
+        return
         
-        if not scene_id or not ha_integration:
-            return
-            
-        # Activate scene
-        await ha_integration.activate_scene(scene_id, transition)
-        
-    except Exception as e:
-        _LOGGER.error(f"Error handling scene activation action: {str(e)}")
+    # Activate scene
+    await ha_integration.activate_scene(scene_id, transition)
 
 # Helper functions
 async def send_ha_command(
@@ -345,7 +535,7 @@ async def send_ha_command(
         if not ha_integration:
             return False
             
-        domain = entity_id.split(".")[0]
+        domain = entity_domain(entity_id)
         return await ha_integration.call_service(
             domain,
             command,
@@ -363,7 +553,7 @@ async def get_ha_state(entity_id: str) -> Optional[Dict[str, Any]]:
         if not ha_integration:
             return None
             
-        return await ha_integration.get_state(entity_id)
+        return await _cached_state(entity_id)
         
     except Exception as e:
         _LOGGER.error(f"Error getting Home Assistant state: {str(e)}")
@@ -3,33 +3,64 @@ Automation rules system for MAIA.
 Handles complex automation scenarios based on geofencing and other events.
 """
 import logging
-from typing import Dict, List, Optional, Any, Union, Callable
+from typing import Dict, List, Optional, Any, Union, Callable, Deque, Iterable, Tuple, Set, FrozenSet, Mapping, Iterator
+from collections import deque
 from datetime import datetime, time, timedelta
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from enum import IntEnum
+from types import MappingProxyType
 import json
 import asyncio
+import string
+import inspect
+from bisect import bisect_left, insort
 from ..database.geofencing import GeofenceEvent
 
 _LOGGER = logging.getLogger(__name__)
 
+# Event types a geofence can emit
+_EVENT_TYPES = frozenset(("enter", "exit", "dwell"))
+
+# How long an enter/dwell event keeps a zone in a device's current zones
+_CURRENT_ZONE_WINDOW = timedelta(minutes=5)
+
 @dataclass
 class TimeCondition:
     """Time-based condition."""
     start_time: Optional[time] = None
     end_time: Optional[time] = None
     days_of_week: Optional[List[int]] = None  # 0=Monday, 6=Sunday
+    _days_mask: Optional[int] = field(default=None, init=False, repr=False, compare=False)
+    _overnight: bool = field(default=False, init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        """Normalize condition once so check only does comparisons."""
+        # Rules loaded from JSON carry times as "HH:MM[:SS]" strings
+        if isinstance(self.start_time, str):
+            self.start_time = time.fromisoformat(self.start_time)
+        if isinstance(self.end_time, str):
+            self.end_time = time.fromisoformat(self.end_time)
+            
+        # Pack days of week into a bitmask, bit 0 = Monday
+        if self.days_of_week is not None:
+            self._days_mask = 0
+            for day in self.days_of_week:
+                self._days_mask |= 1 << day
+                
+        if self.start_time and self.end_time:
+            self._overnight = self.start_time > self.end_time
     
     def check(self, current_time: datetime) -> bool:
         """Check if condition is met."""
         # Check day of week
-        if self.days_of_week is not None:
-            if current_time.weekday() not in self.days_of_week:
+        if self._days_mask is not None:
+            if not self._days_mask >> current_time.weekday() & 1:
                 return False
                 
         # Check time range
         if self.start_time and self.end_time:
             current_time_only = current_time.time()
-            if self.start_time <= self.end_time:
+            if not self._overnight:
                 # Normal time range (e.g., 9:00-17:00)
                 return self.start_time <= current_time_only <= self.end_time
             else:
@@ -44,29 +75,62 @@ class DeviceCondition:
     required_zones: Optional[List[str]] = None  # Must be in these zones
     excluded_zones: Optional[List[str]] = None  # Must not be in these zones
     min_dwell_time: Optional[timedelta] = None  # Must have been in zone for this long
+    _required_set: FrozenSet[str] = field(default=frozenset(), init=False, repr=False, compare=False)
+    _excluded_set: FrozenSet[str] = field(default=frozenset(), init=False, repr=False, compare=False)
+    _min_dwell_seconds: float = field(default=0.0, init=False, repr=False, compare=False)
     
-    def check(self, current_zones: List[str], zone_history: List[GeofenceEvent]) -> bool:
-        """Check if condition is met."""
+    def __post_init__(self):
+        """Store zones as sets so check is a single set operation."""
+        self._required_set = frozenset(self.required_zones or ())
+        self._excluded_set = frozenset(self.excluded_zones or ())
+        if self.min_dwell_time:
+            self._min_dwell_seconds = self.min_dwell_time.total_seconds()
+    
+    def check(
+        self,
+        current_zones: Union[List[str], FrozenSet[str]],
+        zone_history: List[GeofenceEvent],
+        now: Optional[datetime] = None,
+        last_enter: Optional[Dict[str, float]] = None,
+        now_ts: Optional[float] = None
+    ) -> bool:
+        """Check if condition is met.
+        
+        last_enter maps zones to the device's latest enter time as epoch
+        seconds; when given it is used instead of searching zone_history,
+        and compared against now_ts.
+        """
         # Check required zones
-        if self.required_zones:
-            if not all(zone in current_zones for zone in self.required_zones):
+        if self._required_set:
+            if not self._required_set.issubset(current_zones):
                 return False
                 
         # Check excluded zones
-        if self.excluded_zones:
-            if any(zone in current_zones for zone in self.excluded_zones):
+        if self._excluded_set:
+            if not self._excluded_set.isdisjoint(current_zones):
                 return False
                 
         # Check dwell time
         if self.min_dwell_time and current_zones:
-            latest_enter = None
-            for event in reversed(zone_history):
-                if event.event_type == 'enter' and event.zone_id in current_zones:
-                    latest_enter = event.timestamp
-                    break
-                    
-            if not latest_enter or (datetime.now() - latest_enter) < self.min_dwell_time:
-                return False
+            if last_enter is not None:
+                latest = None
+                for zone in current_zones:
+                    entered = last_enter.get(zone)
+                    if entered is not None and (latest is None or entered > latest):
+                        latest = entered
+                if now_ts is None:
+                    now_ts = (now or datetime.now()).timestamp()
+                if latest is None or now_ts - latest < self._min_dwell_seconds:
+                    return False
+            else:
+                latest_enter = None
+                for event in reversed(zone_history):
+                    if event.event_type == 'enter' and event.zone_id in current_zones:
+                        latest_enter = event.timestamp
+                        break
+                        
+                if not latest_enter or ((now or datetime.now()) - latest_enter) < self.min_dwell_time:
+                    return False
                 
         return True
 
@@ -80,30 +144,251 @@ class CountCondition:
     max_count: Optional[int] = None
     time_window: Optional[timedelta] = None
     
-    def check(self, event_history: List[GeofenceEvent]) -> bool:
-        """Check if condition is met."""
-        # Filter events
-        filtered_events = event_history
-        if self.zone_id:
-            filtered_events = [e for e in filtered_events if e.zone_id == self.zone_id]
-        if self.device_mac:
-            filtered_events = [e for e in filtered_events if e.device_mac == self.device_mac]
-        if self.event_type:
-            filtered_events = [e for e in filtered_events if e.event_type == self.event_type]
-            
-        # Apply time window
-        if self.time_window:
-            cutoff = datetime.now() - self.time_window
-            filtered_events = [e for e in filtered_events if e.timestamp >= cutoff]
-            
-        # Check count
-        count = len(filtered_events)
+    @property
+    def spec(self) -> "CountSpec":
+        """Key identifying which events this condition counts."""
+        return (self.event_type, self.zone_id, self.device_mac, self.time_window)
+        
+    def check_count(self, count: int) -> bool:
+        """Check if an event count satisfies the condition."""
         if self.min_count is not None and count < self.min_count:
             return False
         if self.max_count is not None and count > self.max_count:
             return False
-            
         return True
+    
+    def check(
+        self,
+        event_history: List[GeofenceEvent],
+        now: Optional[datetime] = None
+    ) -> bool:
+        """Check if condition is met."""
+        # Count matching events in one pass, without intermediate lists
+        zone_id = self.zone_id
+        device_mac = self.device_mac
+        event_type = self.event_type
+        cutoff = (now or datetime.now()) - self.time_window if self.time_window else None
+        count = sum(
+            1 for e in event_history
+            if (not zone_id or e.zone_id == zone_id)
+            and (not device_mac or e.device_mac == device_mac)
+            and (not event_type or e.event_type == event_type)
+            and (cutoff is None or e.timestamp >= cutoff)
+        )
+        
+        # Check count
+        return self.check_count(count)
+
+# (event_type, zone_id, device_mac, time_window) of a CountCondition
+CountSpec = Tuple[Optional[str], Optional[str], Optional[str], Optional[timedelta]]
+
+class SlidingCounters:
+    """Per-device event counts over sliding time windows.
+    
+    Only specs referenced by a registered CountCondition are tracked. Each
+    keeps, per device, a sorted list of the timestamps of matching events
+    as epoch seconds, so a count is a float bisect for the window start
+    instead of filtering the event history. Entries before the window are
+    trimmed lazily in bulk.
+    """
+    
+    # Trim a window once this many entries have fallen out of it
+    _TRIM_AT = 64
+    
+    def __init__(self, history_limit: int):
+        """Initialize counters."""
+        self._history_limit = history_limit
+        self._specs: Dict[Optional[str], List[CountSpec]] = {}
+        self._windows: Dict[Tuple[CountSpec, str], List[float]] = {}
+        
+    def track(
+        self,
+        specs: Set[CountSpec],
+        histories: Dict[str, Iterable[GeofenceEvent]]
+    ) -> None:
+        """Track exactly the given specs, backfilling new ones from histories."""
+        tracked = {spec for bucket in self._specs.values() for spec in bucket}
+        self._windows = {
+            key: window for key, window in self._windows.items()
+            if key[0] in specs
+        }
+        self._specs = {}
+        for spec in specs:
+            # Index by event type; a spec without one matches every event
+            self._specs.setdefault(spec[0] or None, []).append(spec)
+            
+        for spec in specs - tracked:
+            for device_mac, history in histories.items():
+                for event in history:
+                    if self._matches(spec, event):
+                        self._insert(self._window(spec, device_mac), event.timestamp.timestamp())
+                        
+    @staticmethod
+    def _matches(spec: CountSpec, event: GeofenceEvent) -> bool:
+        """Check if an event is counted by a spec."""
+        event_type, zone_id, device_mac, _ = spec
+        return (
+            (not event_type or event.event_type == event_type)
+            and (not zone_id or event.zone_id == zone_id)
+            and (not device_mac or event.device_mac == device_mac)
+        )
+        
+    def _window(self, spec: CountSpec, device_mac: str) -> List[float]:
+        """Get the timestamps counted for a spec and device."""
+        key = (spec, device_mac)
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = []
+        return window
+        
+    def _insert(self, window: List[float], timestamp: float) -> None:
+        """Add a timestamp, keeping the window sorted and bounded."""
+        # Events nearly always arrive in order, so this is usually an append
+        if not window or timestamp >= window[-1]:
+            window.append(timestamp)
+        else:
+            insort(window, timestamp)
+        if len(window) >= self._history_limit + self._TRIM_AT:
+            del window[:-self._history_limit]
+        
+    def add(self, event: GeofenceEvent, ts: Optional[float] = None) -> None:
+        """Count an event for every tracked spec matching it.
+        
+        ts is the event timestamp as epoch seconds, if already converted.
+        """
+        for specs in (self._specs.get(event.event_type), self._specs.get(None)):
+            if not specs:
+                continue
+            for spec in specs:
+                if self._matches(spec, event):
+                    if ts is None:
+                        ts = event.timestamp.timestamp()
+                    self._insert(self._window(spec, event.device_mac), ts)
+                    
+    def count(
+        self,
+        spec: CountSpec,
+        device_mac: str,
+        now: Optional[datetime] = None,
+        now_ts: Optional[float] = None
+    ) -> int:
+        """Get the number of matching events of a device within the window."""
+        window = self._windows.get((spec, device_mac))
+        if not window:
+            return 0
+        start = 0
+        time_window = spec[3]
+        if time_window:
+            if now_ts is None:
+                now_ts = (now or datetime.now()).timestamp()
+            start = bisect_left(window, now_ts - time_window.total_seconds())
+            if start >= self._TRIM_AT:
+                del window[:start]
+                start = 0
+        # Count no more events than the history keeps
+        return min(len(window) - start, self._history_limit)
+
+_formatter = string.Formatter()
+
+def _compile_template(template: str) -> Callable[[Mapping[str, Any]], str]:
+    """Parse a str.format template once into a render function."""
+    parts = list(_formatter.parse(template))
+    
+    # Indexed or attribute fields and nested format specs are left to
+    # str.format itself
+    if any(
+        field is not None and (not field.isidentifier() or "{" in spec)
+        for _, field, spec, _ in parts
+    ):
+        return lambda values: template.format_map(values)
+        
+    if all(field is None for _, field, _, _ in parts):
+        text = "".join(literal for literal, _, _, _ in parts)
+        return lambda values: text
+        
+    def render(values: Mapping[str, Any]) -> str:
+        out = []
+        for literal, field, spec, conversion in parts:
+            if literal:
+                out.append(literal)
+            if field is not None:
+                value = values[field]
+                if conversion == "r":
+                    value = repr(value)
+                elif conversion == "s":
+                    value = str(value)
+                elif conversion == "a":
+                    value = ascii(value)
+                out.append(format(value, spec))
+        return "".join(out)
+        
+    return render
+
+@dataclass(slots=True)
+class _PayloadTemplate:
+    """Webhook payload with its string values parsed once."""
+    fields: List[Tuple[str, Callable[[Mapping[str, Any]], str]]]
+    
+    def render(self, payload: Dict[str, Any], values: Mapping[str, Any]) -> Dict[str, Any]:
+        """Get the payload with its string values formatted."""
+        rendered = dict(payload)
+        for key, render in self.fields:
+            rendered[key] = render(values)
+        return rendered
+
+# Template names for event attributes
+_EVENT_FIELDS = {"device": "device_mac", "zone": "zone_id", "event": "event_type"}
+
+# Shared stand-in for missing parameters and variables, instead of a new {}
+# per call
+_EMPTY_MAPPING: Mapping[str, Any] = MappingProxyType({})
+
+class _TemplateValues(Mapping):
+    """Values for message and payload templates.
+    
+    Event attributes are read only when a template asks for them, so no
+    kwargs dict is built per action; rule variables take precedence.
+    """
+    __slots__ = ("_event", "_variables")
+    
+    def __init__(self, event: GeofenceEvent, variables: Mapping[str, Any]):
+        self._event = event
+        self._variables = variables
+        
+    def __getitem__(self, key: str) -> Any:
+        if key in self._variables:
+            return self._variables[key]
+        return getattr(self._event, _EVENT_FIELDS[key])
+        
+    def __iter__(self) -> Iterator[str]:
+        yield from _EVENT_FIELDS.keys() - self._variables.keys()
+        yield from self._variables
+        
+    def __len__(self) -> int:
+        return len(_EVENT_FIELDS.keys() - self._variables.keys()) + len(self._variables)
+
+def _takes_prepared(handler: Callable) -> bool:
+    """Whether an action handler accepts the prepared dict as 4th argument."""
+    try:
+        parameters = inspect.signature(handler).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(p.kind == p.VAR_POSITIONAL for p in parameters) or sum(
+        p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD) for p in parameters
+    ) >= 4
+
+class ActionType(IntEnum):
+    """Built-in action types, indexing the handler table."""
+    NOTIFY = 0
+    SCENE = 1
+    DEVICE = 2
+    SCRIPT = 3
+    WEBHOOK = 4
+    DELAY = 5
+    CONDITION = 6
+    SEQUENCE = 7
+    PARALLEL = 8
+    REPEAT = 9
 
 @dataclass
 class Action:
@@ -112,6 +397,66 @@ class Action:
     target: str
     parameters: Optional[Dict[str, Any]] = None
     delay: Optional[timedelta] = None
+    _type: Optional[ActionType] = field(default=None, init=False, repr=False, compare=False)
+    _handler: Optional[Callable] = field(default=None, init=False, repr=False, compare=False)
+    _parameters: Optional[Mapping[str, Any]] = field(default=None, init=False, repr=False, compare=False)
+    _prepared: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        """Resolve built-in action types to their table index."""
+        # Types registered by name only stay None and use ACTION_HANDLERS
+        if isinstance(self.action_type, str):
+            self._type = ActionType.__members__.get(self.action_type.upper())
+    
+    def _lookup_handler(self) -> Optional[Callable]:
+        """Get the handler for this action's type."""
+        if self._type is not None:
+            return _HANDLERS[self._type]
+        return ACTION_HANDLERS.get(self.action_type)
+    
+    def compile(self) -> None:
+        """Resolve the handler and prepare parameters once.
+        
+        Message templates are parsed, and nested actions and conditions are
+        built, into a dict handed to the handler next to the parameters;
+        the parameters themselves stay plain JSON. Handlers taking only
+        (target, parameters, context) are called without it.
+        """
+        handler = self._lookup_handler()
+        if not handler:
+            raise ValueError(f"Unknown action type: {self.action_type}")
+        self._handler = handler
+        
+        # Handlers only read parameters, so missing ones share one empty mapping
+        parameters = self._parameters = self.parameters or _EMPTY_MAPPING
+        self._prepared = None
+        if not _takes_prepared(handler):
+            return
+            
+        prepared: Dict[str, Any] = {}
+        if self._type == ActionType.NOTIFY:
+            message = parameters.get("message")
+            if isinstance(message, str):
+                prepared["message"] = _compile_template(message)
+        elif self._type == ActionType.WEBHOOK:
+            payload = parameters.get("payload")
+            if isinstance(payload, dict):
+                prepared["payload"] = _PayloadTemplate([
+                    (key, _compile_template(value))
+                    for key, value in payload.items()
+                    if isinstance(value, str)
+                ])
+        elif self._type in (ActionType.SEQUENCE, ActionType.PARALLEL):
+            prepared["actions"] = _build_actions(parameters.get("actions", []))
+        elif self._type == ActionType.REPEAT:
+            prepared["action"] = _build_actions([parameters.get("action", {})])[0]
+        elif self._type == ActionType.CONDITION:
+            prepared["then"] = _build_actions(parameters.get("then", []))
+            prepared["else"] = _build_actions(parameters.get("else", []))
+            condition_class = _CONDITION_CLASSES.get(self.target)
+            if condition_class:
+                prepared["condition"] = condition_class(**parameters.get("condition", {}))
+        self._prepared = prepared or None
     
     async def execute(self, event_context: Dict[str, Any]):
         """Execute action with optional delay."""
@@ -119,33 +464,123 @@ class Action:
             await asyncio.sleep(self.delay.total_seconds())
             
         try:
-            # Get action handler
-            handler = ACTION_HANDLERS.get(self.action_type)
-            if not handler:
-                _LOGGER.error(f"Unknown action type: {self.action_type}")
-                return
+            # Actions built outside a rule are compiled on first use; an
+            # unknown type raises here
+            if self._handler is None:
+                self.compile()
                 
             # Execute action
-            await handler(self.target, self.parameters or {}, event_context)
+            if self._prepared:
+                await self._handler(self.target, self._parameters, event_context, self._prepared)
+            else:
+                await self._handler(self.target, self._parameters, event_context)
             
         except Exception as e:
-            _LOGGER.error(f"Failed to execute action: {str(e)}")
+            # Contained here so one failing action doesn't stop the rest of
+            # a rule, sequence or repeat
+            _LOGGER.error("Failed to execute %s action: %s", self.action_type, e)
+
+_CONDITION_CLASSES = {
+    "time": TimeCondition,
+    "device": DeviceCondition,
+    "count": CountCondition
+}
+
+def _build_actions(actions_data: List[Dict[str, Any]]) -> List[Action]:
+    """Build and compile nested actions from their parameter dicts."""
+    actions = [Action(**action_data) for action_data in actions_data]
+    for action in actions:
+        action.compile()
+    return actions
 
 @dataclass
 class AutomationRule:
     """Automation rule definition."""
     rule_id: str
     name: str
-    description: Optional[str] = None
     trigger_events: List[str]  # List of event types to trigger on
+    actions: List[Action]
+    description: Optional[str] = None
     trigger_zones: Optional[List[str]] = None  # Only trigger for these zones
     trigger_devices: Optional[List[str]] = None  # Only trigger for these devices
     time_conditions: Optional[List[TimeCondition]] = None
     device_conditions: Optional[List[DeviceCondition]] = None
     count_conditions: Optional[List[CountCondition]] = None
-    actions: List[Action]
     enabled: bool = True
     metadata: Optional[Dict[str, Any]] = None
+    sequential: bool = True  # False runs actions concurrently; delays then no longer order them
+    _compiled: Optional[Callable[..., bool]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    
+    def compile(self, counters: Optional[SlidingCounters] = None) -> None:
+        """Compile trigger and conditions into a single match function.
+        
+        Must be called again after the rule is changed; AutomationEngine
+        does so in add_rule. With counters, count conditions read their
+        counts from them instead of filtering the zone history.
+        """
+        unknown = set(self.trigger_events) - _EVENT_TYPES
+        if unknown:
+            raise ValueError(f"Unknown event types: {', '.join(sorted(unknown))}")
+        for action in self.actions:
+            action.compile()
+            
+        trigger_events = frozenset(self.trigger_events)
+        trigger_zones = frozenset(self.trigger_zones) if self.trigger_zones else None
+        trigger_devices = frozenset(self.trigger_devices) if self.trigger_devices else None
+        
+        # Conditions that can never fail are left out
+        time_checks = [
+            cond.check for cond in self.time_conditions or ()
+            if cond._days_mask is not None or (cond.start_time and cond.end_time)
+        ]
+        device_checks = [
+            cond.check for cond in self.device_conditions or ()
+            if cond.required_zones or cond.excluded_zones or cond.min_dwell_time
+        ]
+        count_conditions = [
+            cond for cond in self.count_conditions or ()
+            if cond.min_count is not None or cond.max_count is not None
+        ]
+        if counters is None:
+            count_checks = [
+                lambda event, zone_history, now, now_ts, check=cond.check: check(zone_history, now)
+                for cond in count_conditions
+            ]
+        else:
+            count_checks = [
+                lambda event, zone_history, now, now_ts, check=cond.check_count, spec=cond.spec:
+                    check(counters.count(spec, event.device_mac, now, now_ts))
+                for cond in count_conditions
+            ]
+        
+        def match(
+            event: GeofenceEvent,
+            current_zones: FrozenSet[str],
+            zone_history: List[GeofenceEvent],
+            now: datetime,
+            last_enter: Optional[Dict[str, float]] = None,
+            now_ts: Optional[float] = None
+        ) -> bool:
+            if event.event_type not in trigger_events:
+                return False
+            if trigger_zones is not None and event.zone_id not in trigger_zones:
+                return False
+            if trigger_devices is not None and event.device_mac not in trigger_devices:
+                return False
+            for check in time_checks:
+                if not check(event.timestamp):
+                    return False
+            for check in device_checks:
+                if not check(current_zones, zone_history, now, last_enter, now_ts):
+                    return False
+            for check in count_checks:
+                if not check(event, zone_history, now, now_ts):
+                    return False
+            return True
+            
+        self._compiled = match
     
     def check_trigger(self, event: GeofenceEvent) -> bool:
         """Check if rule should trigger for event."""
@@ -170,7 +605,8 @@ class AutomationRule:
         self,
         event: GeofenceEvent,
         current_zones: List[str],
-        zone_history: List[GeofenceEvent]
+        zone_history: List[GeofenceEvent],
+        now: Optional[datetime] = None
     ) -> bool:
         """Check if all conditions are met."""
         # Check time conditions
@@ -180,12 +616,12 @@ class AutomationRule:
                 
         # Check device conditions
         if self.device_conditions:
-            if not all(cond.check(current_zones, zone_history) for cond in self.device_conditions):
+            if not all(cond.check(current_zones, zone_history, now) for cond in self.device_conditions):
                 return False
                 
         # Check count conditions
         if self.count_conditions:
-            if not all(cond.check(zone_history) for cond in self.count_conditions):
+            if not all(cond.check(zone_history, now) for cond in self.count_conditions):
                 return False
                 
         return True
@@ -198,11 +634,20 @@ class AutomationRule:
             **context
         }
         
-        for action in self.actions:
-            try:
+        # Action.execute logs and contains its own failures
+        if self.sequential:
+            for action in self.actions:
                 await action.execute(event_context)
-            except Exception as e:
-                _LOGGER.error(f"Failed to execute action for rule {self.rule_id}: {str(e)}")
+            return
+            
+        # Actions are independent I/O, so wait for the slowest instead of the sum
+        results = await asyncio.gather(
+            *(action.execute(event_context) for action in self.actions),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                _LOGGER.error("Rule %s action failed: %s", self.rule_id, result)
 
 class AutomationEngine:
     """Engine for processing automation rules."""
@@ -210,17 +655,32 @@ class AutomationEngine:
     def __init__(self):
         """Initialize automation engine."""
         self.rules: Dict[str, AutomationRule] = {}
-        self._event_history: List[GeofenceEvent] = []
         self._history_limit = 1000  # Keep last 1000 events
+        self._event_history: Deque[GeofenceEvent] = deque(maxlen=self._history_limit)
+        
+        # Per-device indexes updated on each event, so handle_event doesn't
+        # scan the whole history: recent events of each device, the last
+        # enter/dwell time of each zone a device was seen in, and the last
+        # enter time of each zone for dwell time checks
+        self._by_device: Dict[str, Deque[GeofenceEvent]] = {}
+        self._current_zones: Dict[str, Dict[str, float]] = {}
+        self._last_enter: Dict[str, Dict[str, float]] = {}
+        self._counters = SlidingCounters(self._history_limit)
+        
+        # Rules by (event type, zone); zone None holds rules for any zone
+        self._by_event_zone: Dict[Tuple[str, Optional[str]], List[AutomationRule]] = {}
         
     def add_rule(self, rule: AutomationRule) -> bool:
         """Add or update automation rule."""
         try:
+            rule.compile(self._counters)
             self.rules[rule.rule_id] = rule
-            _LOGGER.info(f"Added automation rule: {rule.name} ({rule.rule_id})")
+            self._rebuild_index()
+            self._track_counts()
+            _LOGGER.info("Added automation rule: %s (%s)", rule.name, rule.rule_id)
             return True
         except Exception as e:
-            _LOGGER.error(f"Failed to add rule: {str(e)}")
+            _LOGGER.error("Failed to add rule: %s", e)
             return False
             
     def remove_rule(self, rule_id: str) -> bool:
@@ -228,13 +688,36 @@ class AutomationEngine:
         try:
             if rule_id in self.rules:
                 del self.rules[rule_id]
-                _LOGGER.info(f"Removed automation rule: {rule_id}")
+                self._rebuild_index()
+                self._track_counts()
+                _LOGGER.info("Removed automation rule: %s", rule_id)
                 return True
             return False
         except Exception as e:
-            _LOGGER.error(f"Failed to remove rule: {str(e)}")
+            _LOGGER.error("Failed to remove rule: %s", e)
             return False
             
+    def _rebuild_index(self) -> None:
+        """Rebuild the trigger index after the rule set changed."""
+        index: Dict[Tuple[str, Optional[str]], List[AutomationRule]] = {}
+        for rule in self.rules.values():
+            zones = set(rule.trigger_zones) if rule.trigger_zones else (None,)
+            for event_type in set(rule.trigger_events):
+                for zone_id in zones:
+                    index.setdefault((event_type, zone_id), []).append(rule)
+        self._by_event_zone = index
+        
+    def _track_counts(self) -> None:
+        """Track the counts referenced by the current rules."""
+        self._counters.track(
+            {
+                cond.spec
+                for rule in self.rules.values()
+                for cond in rule.count_conditions or ()
+            },
+            self._by_device
+        )
+        
     def get_rule(self, rule_id: str) -> Optional[AutomationRule]:
         """Get automation rule by ID."""
         return self.rules.get(rule_id)
@@ -245,53 +728,103 @@ class AutomationEngine:
         
     async def handle_event(self, event: GeofenceEvent, context: Dict[str, Any]):
         """Handle geofence event."""
+        await self.handle_events([event], context)
+        
+    async def handle_events(self, events: List[GeofenceEvent], context: Dict[str, Any]):
+        """Handle a batch of geofence events.
+        
+        Events are applied in timestamp order and each is matched against
+        the indexes as they stand after it; the actions of all matched
+        rules are then run together.
+        """
         try:
-            # Add to history
-            self._event_history.append(event)
-            if len(self._event_history) > self._history_limit:
-                self._event_history = self._event_history[-self._history_limit:]
+            if len(events) > 1:
+                events = sorted(events, key=lambda e: e.timestamp)
                 
-            # Get current zones for device
-            current_zones = [
-                e.zone_id for e in self._event_history
-                if e.device_mac == event.device_mac
-                and e.event_type in ('enter', 'dwell')
-                and e.timestamp > datetime.now() - timedelta(minutes=5)
-            ]
-            
-            # Get device history
-            device_history = [
-                e for e in self._event_history
-                if e.device_mac == event.device_mac
-            ]
+            # Read the clock once for every check made for this batch; window
+            # math is done on epoch seconds
+            now = datetime.now()
+            now_ts = now.timestamp()
+            cutoff = now_ts - _CURRENT_ZONE_WINDOW.total_seconds()
+            index = self._by_event_zone
+            candidates_by_key: Dict[Tuple[str, Optional[str]], List[AutomationRule]] = {}
+            matched: List[Tuple[AutomationRule, GeofenceEvent]] = []
             
-            # Process rules
-            for rule in self.rules.values():
-                try:
-                    # Check trigger
-                    if not rule.check_trigger(event):
-                        continue
-                        
-                    # Check conditions
-                    if not rule.check_conditions(event, current_zones, device_history):
-                        continue
-                        
-                    # Execute actions
-                    await rule.execute_actions(event, context)
+            for event in events:
+                # Add to history; the deque drops the oldest event when full
+                self._event_history.append(event)
+                
+                # Get device history
+                device_history = self._by_device.get(event.device_mac)
+                if device_history is None:
+                    device_history = deque(maxlen=self._history_limit)
+                    self._by_device[event.device_mac] = device_history
+                device_history.append(event)
+                ts = event.timestamp.timestamp()
+                self._counters.add(event, ts)
+                
+                # Get current zones for device
+                zones = self._current_zones.setdefault(event.device_mac, {})
+                last_enter = self._last_enter.setdefault(event.device_mac, {})
+                if event.event_type in ('enter', 'dwell'):
+                    zones[event.zone_id] = ts
+                    if event.event_type == 'enter':
+                        last_enter[event.zone_id] = ts
+                for zone_id in [z for z, seen in zones.items() if seen <= cutoff]:
+                    del zones[zone_id]
+                current_zones = frozenset(zones)
+                
+                # Rules whose trigger can match the event type and zone,
+                # looked up once per pair in the batch
+                key = (event.event_type, event.zone_id)
+                candidates = candidates_by_key.get(key)
+                if candidates is None:
+                    candidates = (
+                        index.get(key, [])
+                        + index.get((event.event_type, None), [])
+                    )
+                    candidates_by_key[key] = candidates
                     
-                except Exception as e:
-                    _LOGGER.error(f"Error processing rule {rule.rule_id}: {str(e)}")
+                for rule in candidates:
+                    try:
+                        if not rule.enabled:
+                            continue
+                            
+                        # Check trigger and conditions
+                        if rule._compiled is None:
+                            rule.compile(self._counters)
+                        if rule._compiled(event, current_zones, device_history, now, last_enter, now_ts):
+                            matched.append((rule, event))
+                            
+                    except Exception as e:
+                        _LOGGER.error("Error processing rule %s: %s", rule.rule_id, e)
+                        
+            if not matched:
+                return
+                
+            # Execute actions
+            results = await asyncio.gather(
+                *(rule.execute_actions(event, context) for rule, event in matched),
+                return_exceptions=True
+            )
+            for (rule, _), result in zip(matched, results):
+                if isinstance(result, Exception):
+                    _LOGGER.error("Error processing rule %s: %s", rule.rule_id, result)
                     
         except Exception as e:
-            _LOGGER.error(f"Error handling event: {str(e)}")
+            _LOGGER.error("Error handling event: %s", e)
 
 # Action Handlers
 ACTION_HANDLERS: Dict[str, Callable] = {}
+_HANDLERS: List[Optional[Callable]] = [None] * len(ActionType)
 
 def register_action_handler(action_type: str):
     """Decorator to register action handler."""
     def decorator(func):
         ACTION_HANDLERS[action_type] = func
+        member = ActionType.__members__.get(action_type.upper())
+        if member is not None:
+            _HANDLERS[member] = func
         return func
     return decorator
 
@@ -299,7 +832,8 @@ def register_action_handler(action_type: str):
 async def handle_notify(
     target: str,
     parameters: Dict[str, Any],
-    context: Dict[str, Any]
+    context: Dict[str, Any],
+    prepared: Optional[Dict[str, Any]] = None
 ):
     """Handle notification action."""
     try:
@@ -310,19 +844,16 @@ async def handle_notify(
         message = parameters.get("message", "")
         if isinstance(message, str):
             # Replace placeholders
-            message = message.format(
-                device=context["event"].device_mac,
-                zone=context["event"].zone_id,
-                event=context["event"].event_type,
-                **parameters.get("variables", {})
-            )
+            values = _TemplateValues(context["event"], parameters.get("variables") or _EMPTY_MAPPING)
+            render = prepared.get("message") if prepared else None
+            message = render(values) if render else message.format_map(values)
             
         # Send notification
         # TODO: Implement notification service integration
-        _LOGGER.info(f"Would send notification via {service}: {message}")
+        _LOGGER.info("Would send notification via %s: %s", service, message)
         
     except Exception as e:
-        _LOGGER.error(f"Failed to send notification: {str(e)}")
+        _LOGGER.error("Failed to send notification: %s", e)
 
 @register_action_handler("scene")
 async def handle_scene(
@@ -338,10 +869,10 @@ async def handle_scene(
         
         # Activate scene
         # TODO: Implement scene activation
-        _LOGGER.info(f"Would activate scene {scene_id} with transition {transition}s")
+        _LOGGER.info("Would activate scene %s with transition %ss", scene_id, transition)
         
     except Exception as e:
-        _LOGGER.error(f"Failed to activate scene: {str(e)}")
+        _LOGGER.error("Failed to activate scene: %s", e)
 
 @register_action_handler("device")
 async def handle_device(
@@ -358,10 +889,10 @@ async def handle_device(
         
         # Control device
         # TODO: Implement device control
-        _LOGGER.info(f"Would control device {device_id}: {command}({command_params})")
+        _LOGGER.info("Would control device %s: %s(%s)", device_id, command, command_params)
         
     except Exception as e:
-        _LOGGER.error(f"Failed to control device: {str(e)}")
+        _LOGGER.error("Failed to control device: %s", e)
 
 @register_action_handler("script")
 async def handle_script(
@@ -377,16 +908,17 @@ async def handle_script(
         
         # Execute script
         # TODO: Implement script execution
-        _LOGGER.info(f"Would execute script {script_id} with variables {variables}")
+        _LOGGER.info("Would execute script %s with variables %s", script_id, variables)
         
     except Exception as e:
-        _LOGGER.error(f"Failed to execute script: {str(e)}")
+        _LOGGER.error("Failed to execute script: %s", e)
 
 @register_action_handler("webhook")
 async def handle_webhook(
     target: str,
     parameters: Dict[str, Any],
-    context: Dict[str, Any]
+    context: Dict[str, Any],
+    prepared: Optional[Dict[str, Any]] = None
 ):
     """Handle webhook action."""
     try:
@@ -398,22 +930,22 @@ async def handle_webhook(
         
         # Format payload
         if isinstance(payload, dict):
-            payload = {
-                k: v.format(
-                    device=context["event"].device_mac,
-                    zone=context["event"].zone_id,
-                    event=context["event"].event_type,
-                    **parameters.get("variables", {})
-                ) if isinstance(v, str) else v
-                for k, v in payload.items()
-            }
+            values = _TemplateValues(context["event"], parameters.get("variables") or _EMPTY_MAPPING)
+            template = prepared.get("payload") if prepared else None
+            if template:
+                payload = template.render(payload, values)
+            else:
+                payload = {
+                    k: v.format_map(values) if isinstance(v, str) else v
+                    for k, v in payload.items()
+                }
             
         # Send webhook
         # TODO: Implement webhook sending
-        _LOGGER.info(f"Would send webhook to {url}: {method} {payload}")
+        _LOGGER.info("Would send webhook to %s: %s %s", url, method, payload)
         
     except Exception as e:
-        _LOGGER.error(f"Failed to send webhook: {str(e)}")
+        _LOGGER.error("Failed to send webhook: %s", e)
 
 @register_action_handler("delay")
 async def handle_delay(
@@ -430,92 +962,98 @@ async def handle_delay(
         await asyncio.sleep(duration)
         
     except Exception as e:
-        _LOGGER.error(f"Failed to execute delay: {str(e)}")
+        _LOGGER.error("Failed to execute delay: %s", e)
+
+def _nested_actions(
+    parameters: Dict[str, Any],
+    prepared: Optional[Dict[str, Any]],
+    key: str
+) -> List[Action]:
+    """Get nested actions, built at rule load or else from parameters."""
+    if prepared and key in prepared:
+        return prepared[key]
+    return [Action(**action_data) for action_data in parameters.get(key, [])]
 
 @register_action_handler("condition")
 async def handle_condition(
     target: str,
     parameters: Dict[str, Any],
-    context: Dict[str, Any]
+    context: Dict[str, Any],
+    prepared: Optional[Dict[str, Any]] = None
 ):
     """Handle conditional action."""
     try:
         # Get condition parameters
         condition_type = target
         condition_params = parameters.get("condition", {})
-        then_actions = parameters.get("then", [])
-        else_actions = parameters.get("else", [])
+        condition = prepared.get("condition") if prepared else None
         
         # Check condition
         condition_met = False
         if condition_type == "time":
-            condition = TimeCondition(**condition_params)
+            condition = condition or TimeCondition(**condition_params)
             condition_met = condition.check(datetime.now())
         elif condition_type == "device":
-            condition = DeviceCondition(**condition_params)
+            condition = condition or DeviceCondition(**condition_params)
             current_zones = parameters.get("current_zones", [])
             zone_history = parameters.get("zone_history", [])
             condition_met = condition.check(current_zones, zone_history)
         elif condition_type == "count":
-            condition = CountCondition(**condition_params)
+            condition = condition or CountCondition(**condition_params)
             event_history = parameters.get("event_history", [])
             condition_met = condition.check(event_history)
             
         # Execute appropriate actions
-        actions = then_actions if condition_met else else_actions
-        for action_data in actions:
-            action = Action(**action_data)
+        actions = _nested_actions(parameters, prepared, "then" if condition_met else "else")
+        for action in actions:
             await action.execute(context)
             
     except Exception as e:
-        _LOGGER.error(f"Failed to execute conditional action: {str(e)}")
+        _LOGGER.error("Failed to execute conditional action: %s", e)
 
 @register_action_handler("sequence")
 async def handle_sequence(
     target: str,
     parameters: Dict[str, Any],
-    context: Dict[str, Any]
+    context: Dict[str, Any],
+    prepared: Optional[Dict[str, Any]] = None
 ):
     """Handle action sequence."""
     try:
         # Get sequence parameters
-        actions = parameters.get("actions", [])
+        actions = _nested_actions(parameters, prepared, "actions")
         
         # Execute actions in sequence
-        for action_data in actions:
-            action = Action(**action_data)
+        for action in actions:
             await action.execute(context)
             
     except Exception as e:
-        _LOGGER.error(f"Failed to execute action sequence: {str(e)}")
+        _LOGGER.error("Failed to execute action sequence: %s", e)
 
 @register_action_handler("parallel")
 async def handle_parallel(
     target: str,
     parameters: Dict[str, Any],
-    context: Dict[str, Any]
+    context: Dict[str, Any],
+    prepared: Optional[Dict[str, Any]] = None
 ):
     """Handle parallel actions."""
     try:
         # Get parallel parameters
-        actions = parameters.get("actions", [])
+        actions = _nested_actions(parameters, prepared, "actions")
         
         # Execute actions in parallel
-        tasks = []
-        for action_data in actions:
-            action = Action(**action_data)
-            tasks.append(action.execute(context))
-            
-        await asyncio.gather(*tasks)
+        await asyncio.gather(*(action.execute(context) for action in actions))
         
     except Exception as e:
-        _LOGGER.error(f"Failed to execute parallel actions: {str(e)}")
+        _LOGGER.error("Failed to execute parallel actions: %s", e)
 
 @register_action_handler("repeat")
 async def handle_repeat(
     target: str,
     parameters: Dict[str, Any],
-    context: Dict[str, Any]
+    context: Dict[str, Any],
+    prepared: Optional[Dict[str, Any]] = None
 ):
     """Handle action repetition."""
     try:
@@ -524,8 +1062,10 @@ async def handle_repeat(
         interval = parameters.get("interval", 0)  # seconds between repetitions
         action_data = parameters.get("action", {})
         
-        # Create action
-        action = Action(**action_data)
+        # Create action unless it was built at rule load
+        action = prepared.get("action") if prepared else None
+        if action is None:
+            action = Action(**action_data)
         
         # Execute repeated actions
         for _ in range(count):
@@ -534,4 +1074,4 @@ async def handle_repeat(
                 await asyncio.sleep(interval)
                 
     except Exception as e:
-        _LOGGER.error(f"Failed to execute repeated action: {str(e)}") 
\ No newline at end of file
+        _LOGGER.error("Failed to execute repeated action: %s", e) 
\ No newline at end of file
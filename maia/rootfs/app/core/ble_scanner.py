@@ -4,6 +4,8 @@ Handles Bluetooth Low Energy scanning.
 """
 import logging
 import asyncio
+import time
+from collections import OrderedDict
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 import bleak
@@ -11,6 +13,18 @@ from .scanner_base import BaseScanner, ScannerRegistry, ScanResult, ScannerLocat
 
 _LOGGER = logging.getLogger(__name__)
 
+# Devices remembered for advertisement dedupe
+_RECENT_LIMIT = 1024
+
+def _advertisement_metadata(device, advertisement_data) -> Dict[str, Any]:
+    """Build scan result metadata from an advertisement."""
+    return {
+        "name": advertisement_data.local_name or device.name or "Unknown",
+        "manufacturer_data": advertisement_data.manufacturer_data,
+        "service_data": advertisement_data.service_data,
+        "service_uuids": advertisement_data.service_uuids
+    }
+
 class BLEScanner(BaseScanner):
     """Handles BLE scanning."""
     
@@ -20,9 +34,14 @@ class BLEScanner(BaseScanner):
         registry: ScannerRegistry,
         is_mobile: bool = False,
         location: Optional[ScannerLocation] = None,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        service_uuids: Optional[List[str]] = None
     ):
-        """Initialize BLE scanner."""
+        """Initialize BLE scanner.
+        
+        With service_uuids set, advertisements for other services are
+        filtered out by the OS Bluetooth stack.
+        """
         super().__init__(
             scanner_id=scanner_id,
             scanner_type="ble",
@@ -31,8 +50,14 @@ class BLEScanner(BaseScanner):
             location=location,
             metadata=metadata
         )
-        self._scanner = None
+        self._scanner: Optional[bleak.BleakScanner] = None
         self._scanning = False
+        self._service_uuids = service_uuids
+        
+        # Devices advertise many times a second; pass on at most one
+        # advertisement per device per interval
+        self._recent: "OrderedDict[str, float]" = OrderedDict()
+        self._min_interval = 1.0
         
     async def start(self):
         """Start BLE scanning."""
@@ -40,23 +65,23 @@ class BLEScanner(BaseScanner):
             if self._scanning:
                 return True
                 
-            # Check if Bluetooth adapter is available
-            adapters = await bleak.discover_bluetooth_adapters()
-            if not adapters:
-                _LOGGER.warning("No Bluetooth adapters found")
-                return False
-                
-            self._scanner = bleak.BleakScanner()
-            self._scanner.register_detection_callback(self._device_detected)
+            # Create the scanner once and reuse it across restarts; a missing
+            # adapter surfaces as an error from start()
+            if self._scanner is None:
+                self._scanner = bleak.BleakScanner(
+                    detection_callback=self._device_detected,
+                    service_uuids=self._service_uuids,
+                    scanning_mode="active"
+                )
             
             # Start scanning
             await self._scanner.start()
             self._scanning = True
-            _LOGGER.info(f"BLE scanner {self._scanner_id} started")
+            _LOGGER.info("BLE scanner %s started", self._scanner_id)
             return True
             
         except Exception as e:
-            _LOGGER.error(f"Failed to start BLE scanner: {str(e)}")
+            _LOGGER.error("Failed to start BLE scanner: %s", e)
             return False
             
     async def stop(self):
@@ -65,31 +90,38 @@ class BLEScanner(BaseScanner):
             if self._scanner and self._scanning:
                 await self._scanner.stop()
                 self._scanning = False
-                _LOGGER.info(f"BLE scanner {self._scanner_id} stopped")
+                _LOGGER.info("BLE scanner %s stopped", self._scanner_id)
             return True
         except Exception as e:
-            _LOGGER.error(f"Failed to stop BLE scanner: {str(e)}")
+            _LOGGER.error("Failed to stop BLE scanner: %s", e)
             return False
             
     async def _device_detected(self, device, advertisement_data):
         """Handle detected BLE device."""
         try:
+            # Drop repeats of a recently reported device before allocating
+            now = time.monotonic()
+            address = device.address
+            recent = self._recent
+            last = recent.get(address)
+            if last is not None and now - last < self._min_interval:
+                return
+            recent[address] = now
+            recent.move_to_end(address)
+            if len(recent) > _RECENT_LIMIT:
+                recent.popitem(last=False)
+                
             # Create scan result
             result = ScanResult(
                 timestamp=datetime.now(),
                 scanner_id=self._scanner_id,
-                device_id=device.address,
+                device_id=address,
                 rssi=advertisement_data.rssi,
-                metadata={
-                    "name": advertisement_data.local_name or device.name or "Unknown",
-                    "manufacturer_data": advertisement_data.manufacturer_data,
-                    "service_data": advertisement_data.service_data,
-                    "service_uuids": advertisement_data.service_uuids
-                }
+                metadata=_advertisement_metadata(device, advertisement_data)
             )
             
             # Process result
             await self._handle_detection(result)
             
         except Exception as e:
-            _LOGGER.error(f"Error processing device detection: {str(e)}") 
\ No newline at end of file
+            _LOGGER.error("Error processing device detection: %s", e) 
\ No newline at end of file
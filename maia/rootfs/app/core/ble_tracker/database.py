@@ -3,16 +3,223 @@ Database interaction module for BLE tracking.
 Handles all PostgreSQL/PostGIS operations.
 """
 from typing import Dict, List, Optional, Any, Tuple
+import asyncio
 import logging
-from datetime import datetime, timedelta
+import struct
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
 import asyncpg
-from asyncpg import Pool
+from asyncpg import Connection, Pool
 from geoalchemy2 import Geometry
 from shapely.geometry import Point
-import json
+import orjson
 
 _LOGGER = logging.getLogger(__name__)
 
+# Little-endian EWKB header for a POINT Z with SRID, followed by x, y, z
+_EWKB_POINT_Z = struct.Struct("<BIIddd")
+_EWKB_POINT_Z_TYPE = 1 | 0x80000000 | 0x20000000  # Point | Z flag | SRID flag
+
+def encode_point_z(x: float, y: float, z: float, srid: int = 4326) -> bytes:
+    """Encode a 3D point as EWKB for binding to a geometry parameter."""
+    return _EWKB_POINT_Z.pack(1, _EWKB_POINT_Z_TYPE, srid, x, y, z)
+
+def _encode_jsonb(value: Any) -> bytes:
+    """Encode a jsonb parameter in binary format: version byte + JSON."""
+    return b"\x01" + orjson.dumps(value)
+
+def _decode_jsonb(data: bytes) -> Any:
+    """Decode a binary jsonb value, skipping the version byte."""
+    return orjson.loads(memoryview(data)[1:])
+
+def _encode_geometry(value: Any) -> bytes:
+    """Encode a geometry parameter: EWKB bytes or an (x, y, z) tuple."""
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    return encode_point_z(*value)
+
+# Write-behind batching: rows queued by store_ble_reading/store_device_position
+# are flushed together once this many are waiting or after this delay
+_WRITE_BATCH_SIZE = 500
+_WRITE_BATCH_DELAY = 0.05
+# Queued rows beyond this make store calls wait for the writer to catch up
+_WRITE_QUEUE_SIZE = 10000
+
+_INSERT_BLE_READING = """
+    INSERT INTO ble_readings 
+    (time, scanner_id, device_mac, rssi, device_name, metadata)
+    VALUES ($1, $2, $3, $4, $5, $6)
+"""
+
+_INSERT_DEVICE_POSITION = """
+    INSERT INTO device_positions 
+    (time, device_mac, position, accuracy, source_readings)
+    VALUES ($1, $2, $3, $4, $5)
+"""
+
+# Queued inserts that the writer switches to binary COPY for batches larger
+# than _COPY_MIN_ROWS: table and columns matching the statement's values
+_COPY_MIN_ROWS = 100
+_COPY_TARGETS = {
+    _INSERT_BLE_READING: (
+        "ble_readings",
+        ("time", "scanner_id", "device_mac", "rssi", "device_name", "metadata")
+    ),
+    _INSERT_DEVICE_POSITION: (
+        "device_positions",
+        ("time", "device_mac", "position", "accuracy", "source_readings")
+    )
+}
+
+_UPSERT_SCANNER_LOCATION = """
+    INSERT INTO scanner_locations (id, location, metadata)
+    VALUES ($1, $2, $3)
+    ON CONFLICT (id) DO UPDATE
+    SET location = $2,
+        metadata = $3,
+        last_seen = NOW()
+"""
+
+_INSERT_CALIBRATION_POINT = """
+    INSERT INTO calibration_points 
+    (location, reference_device, readings)
+    VALUES ($1, $2, $3)
+"""
+
+_SELECT_RECENT_READINGS = """
+    SELECT 
+        time,
+        scanner_id,
+        rssi,
+        device_name,
+        r.metadata,
+        {scanner_location} as scanner_location
+    FROM ble_readings r
+    JOIN scanner_locations s ON r.scanner_id = s.id
+    WHERE device_mac = $1
+    AND time > NOW() - $2::interval
+    ORDER BY time DESC
+"""
+
+# One row per scanner: mean RSSI and the latest name/metadata of the
+# device's readings in the window. s.id is the key of scanner_locations,
+# so its coordinates can be selected while grouping by it
+_SELECT_RECENT_SCANNER_READINGS = """
+    SELECT 
+        r.scanner_id,
+        max(r.time) as time,
+        avg(r.rssi)::float8 as rssi,
+        count(*) as reading_count,
+        (array_agg(r.device_name ORDER BY r.time DESC))[1] as device_name,
+        (array_agg(r.metadata ORDER BY r.time DESC))[1] as metadata,
+        {scanner_location} as scanner_location
+    FROM ble_readings r
+    JOIN scanner_locations s ON r.scanner_id = s.id
+    WHERE r.device_mac = $1
+    AND r.time > NOW() - $2::interval
+    GROUP BY r.scanner_id, s.id
+    ORDER BY time DESC
+"""
+
+_SELECT_DEVICE_HISTORY = """
+    SELECT 
+        time,
+        {position_xyz},
+        accuracy,
+        source_readings
+    FROM device_positions
+    WHERE device_mac = $1
+    AND time >= $2
+    AND ($3::timestamptz IS NULL OR time <= $3)
+    ORDER BY time ASC
+"""
+
+_SELECT_ACTIVE_SCANNERS = """
+    SELECT 
+        id,
+        {location_xyz},
+        installed_at,
+        last_seen,
+        metadata
+    FROM scanner_locations
+    WHERE last_seen > NOW() - $1::interval
+    ORDER BY last_seen DESC
+"""
+
+# Queries reading point coordinates. The generated x/y/z columns come with
+# schema version 2, and init scripts never rerun on an existing volume, so
+# databases without them read the coordinates from the geometry instead
+_COORDINATE_QUERIES = (
+    _SELECT_RECENT_READINGS,
+    _SELECT_RECENT_SCANNER_READINGS,
+    _SELECT_DEVICE_HISTORY,
+    _SELECT_ACTIVE_SCANNERS
+)
+_XYZ_COLUMNS = {
+    "scanner_location": "ARRAY[s.x, s.y, s.z]::float8[]",
+    "position_xyz": "x, y, z",
+    "location_xyz": "x, y, z"
+}
+_XYZ_FROM_GEOMETRY = {
+    "scanner_location": "ARRAY[ST_X(s.location), ST_Y(s.location), ST_Z(s.location)]::float8[]",
+    "position_xyz": "ST_X(position) as x, ST_Y(position) as y, ST_Z(position) as z",
+    "location_xyz": "ST_X(location) as x, ST_Y(location) as y, ST_Z(location) as z"
+}
+
+_HAS_XYZ_COLUMNS = """
+    SELECT count(*) = 2
+    FROM information_schema.columns
+    WHERE table_schema = current_schema()
+    AND table_name IN ('scanner_locations', 'device_positions')
+    AND column_name = 'x'
+"""
+
+def _scanner_reading(row: asyncpg.Record) -> Dict[str, Any]:
+    """Convert a per-scanner aggregate row to a reading dict."""
+    return {
+        "time": row["time"],
+        "scanner_id": row["scanner_id"],
+        "rssi": row["rssi"],
+        "reading_count": row["reading_count"],
+        "device_name": row["device_name"],
+        "metadata": row["metadata"],
+        "scanner_location": row["scanner_location"]
+    }
+
+def _merge_reading(
+    readings: List[Dict[str, Any]],
+    reading: Dict[str, Any],
+    scanner_location: Optional[List[float]]
+) -> List[Dict[str, Any]]:
+    """Fold a reading into per-scanner aggregates as the newest reading.
+    
+    A scanner without an aggregate row gets one if its location is known,
+    otherwise the reading is left out.
+    """
+    for index, row in enumerate(readings):
+        if row["scanner_id"] == reading["scanner_id"]:
+            count = row["reading_count"]
+            row["rssi"] = (row["rssi"] * count + reading["rssi"]) / (count + 1)
+            row["reading_count"] = count + 1
+            row["time"] = reading["time"]
+            row["device_name"] = reading["device_name"]
+            row["metadata"] = reading["metadata"]
+            # Keep newest first, like ORDER BY time DESC
+            readings.insert(0, readings.pop(index))
+            return readings
+    
+    if scanner_location is not None:
+        readings.insert(0, {
+            "time": reading["time"],
+            "scanner_id": reading["scanner_id"],
+            "rssi": float(reading["rssi"]),
+            "reading_count": 1,
+            "device_name": reading["device_name"],
+            "metadata": reading["metadata"],
+            "scanner_location": scanner_location
+        })
+    return readings
+
 class BLEDatabase:
     """Database handler for BLE tracking."""
     
@@ -20,6 +227,12 @@ class BLEDatabase:
         """Initialize database connection."""
         self.dsn = dsn
         self.pool: Optional[Pool] = None
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._queries: Dict[str, str] = {}
+        # Scanner locations seen in query results or stored, for readings
+        # merged in before the writer has flushed them
+        self._scanner_locations: Dict[str, List[float]] = {}
         
     async def connect(self):
         """Create connection pool."""
@@ -29,45 +242,194 @@ class BLEDatabase:
                 min_size=5,
                 max_size=20,
                 command_timeout=60,
+                # Parameterized statements are prepared once per connection
+                # and reused from asyncpg's statement cache; the default
+                # lifetime would re-prepare the hot inserts every 5 minutes
+                max_cached_statement_lifetime=0,
                 server_settings={
                     'jit': 'off',  # Disable JIT for PostGIS
                     'timezone': 'UTC'
-                }
+                },
+                init=self._init_connection
             )
             _LOGGER.info("Database connection pool created")
             
+            # Pick the coordinate source the schema supports
+            if await self.pool.fetchval(_HAS_XYZ_COLUMNS):
+                coordinates = _XYZ_COLUMNS
+            else:
+                _LOGGER.warning(
+                    "Schema has no x/y/z coordinate columns, reading coordinates "
+                    "from geometry; apply migration 2 from 02-migrations.sql"
+                )
+                coordinates = _XYZ_FROM_GEOMETRY
+            self._queries = {
+                query: query.format(**coordinates) for query in _COORDINATE_QUERIES
+            }
+            
+            # Start background writer for queued inserts
+            self._write_queue = asyncio.Queue(maxsize=_WRITE_QUEUE_SIZE)
+            self._writer_task = asyncio.create_task(self._writer())
+            
         except Exception as e:
             _LOGGER.error(f"Failed to create database pool: {str(e)}")
             raise
             
+    @staticmethod
+    async def _init_connection(conn):
+        """Set up a new pool connection."""
+        # Send geometry parameters as binary EWKB, so the server doesn't
+        # parse EWKT text on every insert
+        await conn.set_type_codec(
+            'geometry',
+            encoder=_encode_geometry,
+            decoder=bytes,
+            schema='public',
+            format='binary'
+        )
+        # jsonb columns take and return Python objects, parsed by orjson
+        await conn.set_type_codec(
+            'jsonb',
+            encoder=_encode_jsonb,
+            decoder=_decode_jsonb,
+            schema='pg_catalog',
+            format='binary'
+        )
+        
     async def close(self):
         """Close all connections."""
+        # Write out queued rows before closing the pool
+        if self._writer_task:
+            try:
+                await asyncio.wait_for(self._write_queue.join(), timeout=5.0)
+            except asyncio.TimeoutError:
+                _LOGGER.warning(f"Dropping {self._write_queue.qsize()} queued rows on close")
+            self._writer_task.cancel()
+            self._writer_task = None
+            
         if self.pool:
             await self.pool.close()
             
+    async def _writer(self):
+        """Write queued rows in batches, one transaction per batch."""
+        loop = asyncio.get_running_loop()
+        queue = self._write_queue
+        while True:
+            sql, args = await queue.get()
+            batches: Dict[str, List[Tuple]] = {sql: [args]}
+            count = 1
+            
+            # Collect whatever else arrives within the batch window
+            deadline = loop.time() + _WRITE_BATCH_DELAY
+            while count < _WRITE_BATCH_SIZE:
+                if queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        sql, args = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    sql, args = queue.get_nowait()
+                batches.setdefault(sql, []).append(args)
+                count += 1
+                
+            try:
+                async with self.pool.acquire() as conn:
+                    try:
+                        async with conn.transaction():
+                            await self._write_batches(conn, batches)
+                    except asyncpg.PostgresError as e:
+                        # One bad row fails the whole transaction; write the
+                        # rows one at a time so only the bad ones are lost
+                        _LOGGER.warning(f"Batch of {count} queued rows failed, retrying row by row: {str(e)}")
+                        await self._write_rows(conn, batches)
+                        
+            except Exception as e:
+                _LOGGER.error(f"Failed to write {count} queued rows: {str(e)}")
+                
+            finally:
+                for _ in range(count):
+                    queue.task_done()
+                    
+    def connection(self):
+        """Acquire a pool connection for a burst of calls.
+        
+        Use as `async with database.connection() as conn:` and pass conn= to
+        the query methods, which otherwise acquire a connection per call.
+        """
+        return self.pool.acquire()
+        
+    @asynccontextmanager
+    async def _connection(self, conn: Optional[Connection]):
+        """Use the caller's connection, or acquire one from the pool."""
+        if conn is not None:
+            yield conn
+        else:
+            async with self.pool.acquire() as conn:
+                yield conn
+                
+    @staticmethod
+    async def _write_batches(conn: Connection, batches: Dict[str, List[Tuple]]):
+        """Write batched rows, with COPY for large ble_readings/positions batches."""
+        for sql, rows in batches.items():
+            if len(rows) > _COPY_MIN_ROWS and sql in _COPY_TARGETS:
+                # Rows go through the same codecs as the insert parameters
+                table, columns = _COPY_TARGETS[sql]
+                await conn.copy_records_to_table(
+                    table, records=rows, columns=columns
+                )
+            else:
+                await conn.executemany(sql, rows)
+                
+    @staticmethod
+    async def _write_rows(conn: Connection, batches: Dict[str, List[Tuple]]):
+        """Write batched rows one by one, dropping those the server rejects."""
+        failed = 0
+        error = None
+        for sql, rows in batches.items():
+            for args in rows:
+                try:
+                    await conn.execute(sql, *args)
+                except asyncpg.PostgresError as e:
+                    failed += 1
+                    error = e
+        if failed:
+            _LOGGER.error(f"Dropped {failed} queued rows, last error: {str(error)}")
+            
+    async def _enqueue(self, sql: str, args: Tuple) -> bool:
+        """Queue a row for the background writer.
+        
+        Waits while the queue is full, so producers slow down to the rate
+        the database accepts rows instead of growing memory without bound.
+        """
+        if self._write_queue is None:
+            _LOGGER.error("Database not connected")
+            return False
+        await self._write_queue.put((sql, args))
+        return True
+            
     async def store_scanner_location(
         self,
         scanner_id: str,
         x: float,
         y: float,
         z: float,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        conn: Optional[Connection] = None
     ) -> bool:
         """Store or update scanner location."""
         try:
-            async with self.pool.acquire() as conn:
+            async with self._connection(conn) as conn:
                 # Create PostGIS point
-                point = f"SRID=4326;POINT Z({x} {y} {z})"
+                point = encode_point_z(x, y, z)
                 
                 # Upsert scanner location
-                await conn.execute("""
-                    INSERT INTO scanner_locations (id, location, metadata)
-                    VALUES ($1, ST_GeomFromEWKT($2), $3)
-                    ON CONFLICT (id) DO UPDATE
-                    SET location = ST_GeomFromEWKT($2),
-                        metadata = $3,
-                        last_seen = NOW()
-                """, scanner_id, point, json.dumps(metadata or {}))
+                await conn.execute(
+                    _UPSERT_SCANNER_LOCATION, scanner_id, point, metadata or {}
+                )
+                self._scanner_locations[scanner_id] = [x, y, z]
                 
                 return True
                 
@@ -83,17 +445,17 @@ class BLEDatabase:
         device_name: Optional[str] = None,
         metadata: Optional[Dict[str, Any]] = None
     ) -> bool:
-        """Store BLE reading."""
+        """Store BLE reading.
+        
+        The row is queued and written by the background writer in a batch,
+        stamped with the time it was queued.
+        """
         try:
-            async with self.pool.acquire() as conn:
-                await conn.execute("""
-                    INSERT INTO ble_readings 
-                    (time, scanner_id, device_mac, rssi, device_name, metadata)
-                    VALUES (NOW(), $1, $2, $3, $4, $5)
-                """, scanner_id, device_mac, rssi, device_name, json.dumps(metadata or {}))
-                
-                return True
-                
+            return await self._enqueue(_INSERT_BLE_READING, (
+                datetime.now(timezone.utc), scanner_id, device_mac, rssi,
+                device_name, metadata or {}
+            ))
+            
         except Exception as e:
             _LOGGER.error(f"Failed to store BLE reading: {str(e)}")
             return False
@@ -104,19 +466,18 @@ class BLEDatabase:
         y: float,
         z: float,
         reference_device: str,
-        readings: Dict[str, Any]
+        readings: Dict[str, Any],
+        conn: Optional[Connection] = None
     ) -> bool:
         """Store calibration point with readings."""
         try:
-            async with self.pool.acquire() as conn:
+            async with self._connection(conn) as conn:
                 # Create PostGIS point
-                point = f"SRID=4326;POINT Z({x} {y} {z})"
+                point = encode_point_z(x, y, z)
                 
-                await conn.execute("""
-                    INSERT INTO calibration_points 
-                    (location, reference_device, readings)
-                    VALUES (ST_GeomFromEWKT($1), $2, $3)
-                """, point, reference_device, json.dumps(readings))
+                await conn.execute(
+                    _INSERT_CALIBRATION_POINT, point, reference_device, readings
+                )
                 
                 return True
                 
@@ -133,20 +494,19 @@ class BLEDatabase:
         accuracy: float,
         source_readings: Dict[str, Any]
     ) -> bool:
-        """Store calculated device position."""
+        """Store calculated device position.
+        
+        Queued for the background writer like store_ble_reading.
+        """
         try:
-            async with self.pool.acquire() as conn:
-                # Create PostGIS point
-                point = f"SRID=4326;POINT Z({x} {y} {z})"
-                
-                await conn.execute("""
-                    INSERT INTO device_positions 
-                    (time, device_mac, position, accuracy, source_readings)
-                    VALUES (NOW(), $1, ST_GeomFromEWKT($2), $3, $4)
-                """, device_mac, point, accuracy, json.dumps(source_readings))
-                
-                return True
-                
+            # Create PostGIS point
+            point = encode_point_z(x, y, z)
+            
+            return await self._enqueue(_INSERT_DEVICE_POSITION, (
+                datetime.now(timezone.utc), device_mac, point, accuracy,
+                source_readings
+            ))
+            
         except Exception as e:
             _LOGGER.error(f"Failed to store device position: {str(e)}")
             return False
@@ -154,25 +514,15 @@ class BLEDatabase:
     async def get_recent_readings(
         self,
         device_mac: str,
-        minutes: int = 1
+        minutes: int = 1,
+        conn: Optional[Connection] = None
     ) -> List[Dict[str, Any]]:
         """Get recent readings for a device."""
         try:
-            async with self.pool.acquire() as conn:
-                rows = await conn.fetch("""
-                    SELECT 
-                        time,
-                        scanner_id,
-                        rssi,
-                        device_name,
-                        metadata,
-                        ST_AsGeoJSON(s.location) as scanner_location
-                    FROM ble_readings r
-                    JOIN scanner_locations s ON r.scanner_id = s.id
-                    WHERE device_mac = $1
-                    AND time > NOW() - $2::interval
-                    ORDER BY time DESC
-                """, device_mac, timedelta(minutes=minutes))
+            async with self._connection(conn) as conn:
+                rows = await conn.fetch(
+                    self._queries[_SELECT_RECENT_READINGS], device_mac, timedelta(minutes=minutes)
+                )
                 
                 return [
                     {
@@ -180,8 +530,8 @@ class BLEDatabase:
                         "scanner_id": row["scanner_id"],
                         "rssi": row["rssi"],
                         "device_name": row["device_name"],
-                        "metadata": json.loads(row["metadata"]),
-                        "scanner_location": json.loads(row["scanner_location"])
+                        "metadata": row["metadata"],
+                        "scanner_location": row["scanner_location"]
                     }
                     for row in rows
                 ]
@@ -190,34 +540,95 @@ class BLEDatabase:
             _LOGGER.error(f"Failed to get recent readings: {str(e)}")
             return []
             
+    async def get_recent_scanner_readings(
+        self,
+        device_mac: str,
+        minutes: int = 1,
+        conn: Optional[Connection] = None
+    ) -> List[Dict[str, Any]]:
+        """Get recent readings for a device aggregated per scanner.
+        
+        Same fields as get_recent_readings, with rssi the mean over the
+        window and reading_count the number of readings averaged.
+        """
+        try:
+            async with self._connection(conn) as conn:
+                rows = await conn.fetch(
+                    self._queries[_SELECT_RECENT_SCANNER_READINGS], device_mac, timedelta(minutes=minutes)
+                )
+                
+                return [_scanner_reading(row) for row in rows]
+                
+        except Exception as e:
+            _LOGGER.error(f"Failed to get recent scanner readings: {str(e)}")
+            return []
+            
+    async def store_reading_and_fetch_recent(
+        self,
+        scanner_id: str,
+        device_mac: str,
+        rssi: int,
+        device_name: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        minutes: int = 1,
+        conn: Optional[Connection] = None
+    ) -> List[Dict[str, Any]]:
+        """Store a BLE reading and get the device's recent readings per scanner.
+        
+        The reading is queued for the batched writer like store_ble_reading.
+        It may not be written yet when the recent readings are fetched, so it
+        is merged into the per-scanner aggregates here and always counts.
+        """
+        try:
+            reading = {
+                "time": datetime.now(timezone.utc),
+                "scanner_id": scanner_id,
+                "rssi": rssi,
+                "device_name": device_name,
+                "metadata": metadata or {}
+            }
+            await self._enqueue(_INSERT_BLE_READING, (
+                reading["time"], scanner_id, device_mac, rssi,
+                device_name, reading["metadata"]
+            ))
+            
+            async with self._connection(conn) as conn:
+                rows = await conn.fetch(
+                    self._queries[_SELECT_RECENT_SCANNER_READINGS], device_mac, timedelta(minutes=minutes)
+                )
+            
+            readings = [_scanner_reading(row) for row in rows]
+            for row in readings:
+                self._scanner_locations[row["scanner_id"]] = row["scanner_location"]
+            
+            return _merge_reading(
+                readings, reading, self._scanner_locations.get(scanner_id)
+            )
+                
+        except Exception as e:
+            _LOGGER.error(f"Failed to store reading and get recent readings: {str(e)}")
+            return []
+            
     async def get_device_history(
         self,
         device_mac: str,
         start_time: datetime,
-        end_time: Optional[datetime] = None
+        end_time: Optional[datetime] = None,
+        conn: Optional[Connection] = None
     ) -> List[Dict[str, Any]]:
         """Get device position history."""
         try:
-            async with self.pool.acquire() as conn:
-                rows = await conn.fetch("""
-                    SELECT 
-                        time,
-                        ST_AsGeoJSON(position) as position,
-                        accuracy,
-                        source_readings
-                    FROM device_positions
-                    WHERE device_mac = $1
-                    AND time >= $2
-                    AND ($3::timestamptz IS NULL OR time <= $3)
-                    ORDER BY time ASC
-                """, device_mac, start_time, end_time)
+            async with self._connection(conn) as conn:
+                rows = await conn.fetch(
+                    self._queries[_SELECT_DEVICE_HISTORY], device_mac, start_time, end_time
+                )
                 
                 return [
                     {
                         "time": row["time"],
-                        "position": json.loads(row["position"]),
+                        "position": {"x": row["x"], "y": row["y"], "z": row["z"]},
                         "accuracy": row["accuracy"],
-                        "source_readings": json.loads(row["source_readings"])
+                        "source_readings": row["source_readings"]
                     }
                     for row in rows
                 ]
@@ -228,15 +639,18 @@ class BLEDatabase:
             
     async def get_calibration_points(
         self,
-        reference_device: Optional[str] = None
+        reference_device: Optional[str] = None,
+        conn: Optional[Connection] = None
     ) -> List[Dict[str, Any]]:
         """Get calibration points."""
         try:
-            async with self.pool.acquire() as conn:
+            async with self._connection(conn) as conn:
                 query = """
                     SELECT 
                         id,
-                        ST_AsGeoJSON(location) as location,
+                        ST_X(location) as x,
+                        ST_Y(location) as y,
+                        ST_Z(location) as z,
                         reference_device,
                         measured_at,
                         readings
@@ -252,10 +666,10 @@ class BLEDatabase:
                 return [
                     {
                         "id": row["id"],
-                        "location": json.loads(row["location"]),
+                        "location": {"x": row["x"], "y": row["y"], "z": row["z"]},
                         "reference_device": row["reference_device"],
                         "measured_at": row["measured_at"],
-                        "readings": json.loads(row["readings"])
+                        "readings": row["readings"]
                     }
                     for row in rows
                 ]
@@ -264,29 +678,25 @@ class BLEDatabase:
             _LOGGER.error(f"Failed to get calibration points: {str(e)}")
             return []
             
-    async def get_active_scanners(self, minutes: int = 5) -> List[Dict[str, Any]]:
+    async def get_active_scanners(
+        self,
+        minutes: int = 5,
+        conn: Optional[Connection] = None
+    ) -> List[Dict[str, Any]]:
         """Get recently active scanners."""
         try:
-            async with self.pool.acquire() as conn:
-                rows = await conn.fetch("""
-                    SELECT 
-                        id,
-                        ST_AsGeoJSON(location) as location,
-                        installed_at,
-                        last_seen,
-                        metadata
-                    FROM scanner_locations
-                    WHERE last_seen > NOW() - $1::interval
-                    ORDER BY last_seen DESC
-                """, timedelta(minutes=minutes))
+            async with self._connection(conn) as conn:
+                rows = await conn.fetch(
+                    self._queries[_SELECT_ACTIVE_SCANNERS], timedelta(minutes=minutes)
+                )
                 
                 return [
                     {
                         "id": row["id"],
-                        "location": json.loads(row["location"]),
+                        "location": {"x": row["x"], "y": row["y"], "z": row["z"]},
                         "installed_at": row["installed_at"],
                         "last_seen": row["last_seen"],
-                        "metadata": json.loads(row["metadata"])
+                        "metadata": row["metadata"]
                     }
                     for row in rows
                 ]
@@ -4,7 +4,7 @@ Receives and processes BLE scan data from ESP32 devices.
 """
 from typing import Dict, List, Optional, Any, Callable
 import logging
-import json
+import orjson
 import asyncio
 from datetime import datetime
 import aiomqtt
@@ -13,6 +13,9 @@ from .position_calculator import PositionCalculator
 
 _LOGGER = logging.getLogger(__name__)
 
+# Status payload fields kept as scanner location metadata
+_STATUS_FIELDS = ("status", "version", "uptime")
+
 class BLEMQTTHandler:
     """MQTT handler for BLE tracking."""
     
@@ -34,10 +37,12 @@ class BLEMQTTHandler:
         self.position_calculator = position_calculator
         self.client: Optional[aiomqtt.Client] = None
         self.running = False
-        self.message_handlers: Dict[str, Callable] = {
-            "ble_scanner/+/data": self._handle_scanner_data,
-            "ble_scanner/+/status": self._handle_scanner_status,
-            "ble_scanner/+/calibration": self._handle_calibration_data
+        self._task: Optional[asyncio.Task] = None
+        # Handlers by the last level of ble_scanner/<scanner_id>/<suffix>
+        self._suffix_handlers: Dict[str, Callable] = {
+            "data": self._handle_scanner_data,
+            "status": self._handle_scanner_status,
+            "calibration": self._handle_calibration_data
         }
         
     async def start(self):
@@ -51,18 +56,10 @@ class BLEMQTTHandler:
                 password=self.password,
                 keepalive=60
             )
-            
-            # Set up callbacks
-            self.client.on_connect = self._on_connect
-            self.client.on_disconnect = self._on_disconnect
-            self.client.on_message = self._on_message
-            
-            # Connect to broker
-            await self.client.connect()
             self.running = True
             
-            # Start processing loop
-            asyncio.create_task(self._process_loop())
+            # Connect and receive messages in the background
+            self._task = asyncio.create_task(self._run())
             _LOGGER.info("MQTT handler started")
             
         except Exception as e:
@@ -72,55 +69,57 @@ class BLEMQTTHandler:
     async def stop(self):
         """Stop MQTT handler."""
         self.running = False
-        if self.client:
-            await self.client.disconnect()
+        if self._task:
+            # Leaving the client context disconnects from the broker
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
             
-    async def _process_loop(self):
-        """Main processing loop."""
+    async def _run(self):
+        """Receive and dispatch messages, reconnecting when the connection is lost."""
         while self.running:
             try:
-                await asyncio.sleep(0.1)  # Prevent CPU hogging
-            except Exception as e:
-                _LOGGER.error(f"Error in process loop: {str(e)}")
-                await asyncio.sleep(1)
-                
-    async def _on_connect(self, client, userdata, flags, rc):
-        """Handle connection established."""
-        try:
-            # Subscribe to all relevant topics
-            for topic in self.message_handlers.keys():
-                await self.client.subscribe(topic)
+                async with self.client:
+                    # Subscribe to all relevant topics
+                    for suffix in self._suffix_handlers:
+                        await self.client.subscribe(f"ble_scanner/+/{suffix}")
+                        
+                    _LOGGER.info("Connected to MQTT broker")
+                    
+                    async for message in self.client.messages:
+                        await self._dispatch(message)
+                        
+            except aiomqtt.MqttError as e:
+                _LOGGER.warning(f"Disconnected from MQTT broker: {str(e)}")
+                await asyncio.sleep(5)
                 
-            _LOGGER.info("Connected to MQTT broker")
-            
-        except Exception as e:
-            _LOGGER.error(f"Error in on_connect: {str(e)}")
-            
-    async def _on_disconnect(self, client, userdata, rc):
-        """Handle disconnection."""
-        _LOGGER.warning(f"Disconnected from MQTT broker with code: {rc}")
-        
-    async def _on_message(self, client, userdata, message):
+    async def _dispatch(self, message: aiomqtt.Message):
         """Handle incoming MQTT message."""
         try:
-            # Get topic handler
-            for pattern, handler in self.message_handlers.items():
-                if aiomqtt.topic_matches_sub(pattern, message.topic):
-                    await handler(message)
-                    break
-                    
+            # Topics are ble_scanner/<scanner_id>/<suffix>
+            parts = message.topic.value.split('/')
+            if len(parts) != 3:
+                return
+                
+            handler = self._suffix_handlers.get(parts[2])
+            if handler:
+                await handler(message, parts[1])
+                
         except Exception as e:
             _LOGGER.error(f"Error processing message: {str(e)}")
             
-    async def _handle_scanner_data(self, message):
+    async def _handle_scanner_data(self, message, scanner_id: str):
         """Handle BLE scan data from ESP32."""
         try:
             # Parse message
-            payload = json.loads(message.payload)
-            scanner_id = message.topic.split('/')[1]
+            payload = orjson.loads(message.payload)
             
-            # Store reading
-            await self.database.store_ble_reading(
+            # Store reading and get recent readings for position
+            # calculation, one per scanner
+            readings = await self.database.store_reading_and_fetch_recent(
                 scanner_id=scanner_id,
                 device_mac=payload["device_mac"],
                 rssi=payload["rssi"],
@@ -128,14 +127,11 @@ class BLEMQTTHandler:
                 metadata=payload.get("metadata")
             )
             
-            # Get recent readings for position calculation
-            readings = await self.database.get_recent_readings(
-                device_mac=payload["device_mac"]
-            )
-            
-            if len(readings) >= 3:  # Need at least 3 points for trilateration
+            if len(readings) >= 3:  # Need at least 3 scanners for trilateration
                 # Calculate position
-                position = await self.position_calculator.calculate_position(readings)
+                position = await self.position_calculator.calculate_position(
+                    payload["device_mac"], readings
+                )
                 
                 if position:
                     # Store calculated position
@@ -154,53 +150,56 @@ class BLEMQTTHandler:
         except Exception as e:
             _LOGGER.error(f"Error handling scanner data: {str(e)}")
             
-    async def _handle_scanner_status(self, message):
+    async def _handle_scanner_status(self, message, scanner_id: str):
         """Handle scanner status updates."""
         try:
             # Parse message
-            payload = json.loads(message.payload)
-            scanner_id = message.topic.split('/')[1]
+            payload = orjson.loads(message.payload)
             
             # Update scanner location if provided
             if "location" in payload:
                 loc = payload["location"]
+                self.position_calculator.update_scanner_position(
+                    scanner_id, loc["x"], loc["y"], loc["z"]
+                )
+                
+                metadata = {field: payload.get(field) for field in _STATUS_FIELDS}
+                metadata["last_update"] = datetime.now().isoformat()
                 await self.database.store_scanner_location(
                     scanner_id=scanner_id,
                     x=loc["x"],
                     y=loc["y"],
                     z=loc["z"],
-                    metadata={
-                        "status": payload.get("status"),
-                        "version": payload.get("version"),
-                        "uptime": payload.get("uptime"),
-                        "last_update": datetime.now().isoformat()
-                    }
+                    metadata=metadata
                 )
                 
         except Exception as e:
             _LOGGER.error(f"Error handling scanner status: {str(e)}")
             
-    async def _handle_calibration_data(self, message):
+    async def _handle_calibration_data(self, message, scanner_id: str):
         """Handle calibration data."""
         try:
             # Parse message
-            payload = json.loads(message.payload)
-            scanner_id = message.topic.split('/')[1]
+            payload = orjson.loads(message.payload)
             
             if "reference_point" in payload:
                 point = payload["reference_point"]
-                await self.database.store_calibration_point(
-                    x=point["x"],
-                    y=point["y"],
-                    z=point["z"],
-                    reference_device=payload["reference_device"],
-                    readings=payload["readings"]
-                )
-                
-                # Recalibrate position calculator
-                calibration_points = await self.database.get_calibration_points(
-                    reference_device=payload["reference_device"]
-                )
+                async with self.database.connection() as conn:
+                    await self.database.store_calibration_point(
+                        x=point["x"],
+                        y=point["y"],
+                        z=point["z"],
+                        reference_device=payload["reference_device"],
+                        readings=payload["readings"],
+                        conn=conn
+                    )
+                    
+                    # Recalibrate position calculator
+                    calibration_points = await self.database.get_calibration_points(
+                        reference_device=payload["reference_device"],
+                        conn=conn
+                    )
+                    
                 await self.position_calculator.calibrate(calibration_points)
                 
         except Exception as e:
@@ -219,7 +218,7 @@ class BLEMQTTHandler:
             # Publish config
             await self.client.publish(
                 f"ble_scanner/{scanner_id}/config",
-                json.dumps(config),
+                orjson.dumps(config),
                 qos=1,
                 retain=True
             )
@@ -5,10 +5,9 @@ Handles trilateration and position estimation from BLE RSSI readings.
 from typing import Dict, List, Optional, Any, Tuple
 import logging
 import numpy as np
-from scipy.optimize import minimize
+from scipy.optimize import least_squares
 from filterpy.kalman import KalmanFilter
 from dataclasses import dataclass
-import json
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -19,6 +18,54 @@ class RSSICalibration:
     path_loss_exponent: float  # Signal propagation constant
     std_dev: float  # Standard deviation of measurements
 
+def _range_residuals(point: np.ndarray, scanner_xyz: np.ndarray, distances: np.ndarray) -> np.ndarray:
+    """Differences between distances to the scanners and measured ranges."""
+    return np.sqrt(np.einsum('ij,ij->i', scanner_xyz - point, scanner_xyz - point)) - distances
+
+def _range_jacobian(point: np.ndarray, scanner_xyz: np.ndarray, distances: np.ndarray) -> np.ndarray:
+    """Jacobian of _range_residuals: unit vectors from scanners to point."""
+    offsets = point - scanner_xyz
+    norms = np.sqrt(np.einsum('ij,ij->i', offsets, offsets))
+    return offsets / np.maximum(norms, 1e-9)[:, None]
+
+def solve_position(scanner_xyz: np.ndarray, distances: np.ndarray) -> Optional[np.ndarray]:
+    """Trilaterate a point from scanner positions (N, 3) and ranges (N,).
+    
+    A linearized solve gives the starting point, which Levenberg-Marquardt
+    refines with the analytic Jacobian so no evaluations are spent on
+    finite differences. Returns None if no finite solution is found, or if
+    the scanners are coincident or collinear and cannot fix a position.
+    """
+    scanner_xyz = np.ascontiguousarray(scanner_xyz, dtype=np.float64)
+    distances = np.ascontiguousarray(distances, dtype=np.float64)
+    if not (np.isfinite(scanner_xyz).all() and np.isfinite(distances).all()):
+        return None
+    
+    # Linearize by subtracting the first sphere equation from the others;
+    # with three scanners lstsq gives the minimum-norm solution
+    squared_norms = np.einsum('ij,ij->i', scanner_xyz, scanner_xyz)
+    A = 2 * (scanner_xyz[1:] - scanner_xyz[0])
+    b = distances[0] ** 2 - distances[1:] ** 2 + squared_norms[1:] - squared_norms[0]
+    initial_guess, _, rank, _ = np.linalg.lstsq(A, b, rcond=None)
+    if rank < 2:
+        # Any point on a circle or sphere around the scanners fits equally
+        return None
+        
+    result = least_squares(
+        _range_residuals,
+        initial_guess,
+        jac=_range_jacobian,
+        args=(scanner_xyz, distances),
+        method='lm',
+        max_nfev=20
+    )
+    
+    # Negative status is a failure; 0 means max_nfev was reached, which
+    # still leaves a usable estimate
+    if result.status < 0 or not np.isfinite(result.x).all():
+        return None
+    return result.x
+
 class PositionCalculator:
     """Position calculator for BLE tracking."""
     
@@ -37,59 +84,53 @@ class PositionCalculator:
         # Cache for recent positions
         self.position_cache: Dict[str, Dict[str, Any]] = {}
         
+        # Scanner positions by scanner id, they change rarely
+        self._scanner_pos_cache: Dict[str, np.ndarray] = {}
+        
     async def calibrate(self, calibration_points: List[Dict[str, Any]]):
         """Calibrate using reference measurements."""
         try:
             if not calibration_points:
                 return
                 
-            # Extract distances and RSSI values
-            distances = []
-            rssi_values = []
+            # Gather one row per (calibration point, scanner) reading
+            pairs = [
+                (
+                    (point["location"]["x"], point["location"]["y"], point["location"]["z"]),
+                    reading["scanner_location"],
+                    reading["rssi"]
+                )
+                for point in calibration_points
+                for reading in point["readings"].values()
+            ]
+            point_locs = np.array([pair[0] for pair in pairs], dtype=np.float64)
+            scanner_locs = np.array([pair[1] for pair in pairs], dtype=np.float64)
+            rssi_values = np.fromiter((pair[2] for pair in pairs), dtype=np.float64, count=len(pairs))
+            
+            # True distances to the scanners; co-located pairs have no log
+            distances = np.linalg.norm(scanner_locs - point_locs, axis=1)
+            valid = distances > 0
+            if np.count_nonzero(valid) < 2:
+                return
+            distances = distances[valid]
+            rssi_values = rssi_values[valid]
             
-            for point in calibration_points:
-                location = point["location"]["coordinates"]
-                readings = point["readings"]
-                
-                for scanner_id, reading in readings.items():
-                    # Calculate true distance to scanner
-                    scanner_loc = np.array(reading["scanner_location"])
-                    point_loc = np.array(location)
-                    distance = np.linalg.norm(scanner_loc - point_loc)
-                    
-                    distances.append(distance)
-                    rssi_values.append(reading["rssi"])
-                    
-            # Convert to numpy arrays
-            distances = np.array(distances)
-            rssi_values = np.array(rssi_values)
-            
-            # Fit path loss model
-            def path_loss_error(params):
-                ref_power, path_loss = params
-                predicted_rssi = ref_power - 10 * path_loss * np.log10(distances)
-                return np.sum((predicted_rssi - rssi_values) ** 2)
-                
-            # Optimize parameters
-            result = minimize(
-                path_loss_error,
-                [self.calibration.reference_power, self.calibration.path_loss_exponent],
-                method='nelder-mead'
-            )
-            
-            if result.success:
-                ref_power, path_loss = result.x
-                
+            # rssi = ref_power - 10 * path_loss * log10(d) is linear in
+            # (ref_power, path_loss), so fit it by least squares directly
+            A = np.column_stack([np.ones_like(distances), -10 * np.log10(distances)])
+            params, *_ = np.linalg.lstsq(A, rssi_values, rcond=None)
+            ref_power, path_loss = params
+            
+            if np.isfinite(params).all():
                 # Calculate standard deviation of residuals
-                predicted_rssi = ref_power - 10 * path_loss * np.log10(distances)
-                residuals = predicted_rssi - rssi_values
+                residuals = A @ params - rssi_values
                 std_dev = np.std(residuals)
                 
                 # Update calibration
                 self.calibration = RSSICalibration(
-                    reference_power=ref_power,
-                    path_loss_exponent=path_loss,
-                    std_dev=std_dev
+                    reference_power=float(ref_power),
+                    path_loss_exponent=float(path_loss),
+                    std_dev=float(std_dev)
                 )
                 
                 _LOGGER.info(
@@ -100,13 +141,23 @@ class PositionCalculator:
         except Exception as e:
             _LOGGER.error(f"Calibration failed: {str(e)}")
             
-    def _rssi_to_distance(self, rssi: float) -> float:
-        """Convert RSSI to distance using calibrated path loss model."""
-        try:
-            return 10 ** ((self.calibration.reference_power - rssi) / 
-                         (10 * self.calibration.path_loss_exponent))
-        except Exception:
-            return 0.0
+    def _rssi_to_distance(self, rssi: np.ndarray) -> np.ndarray:
+        """Convert RSSI values to distances using calibrated path loss model."""
+        return np.power(10, (self.calibration.reference_power - rssi) / 
+                        (10 * self.calibration.path_loss_exponent))
+        
+    def update_scanner_position(self, scanner_id: str, x: float, y: float, z: float):
+        """Set the cached position of a scanner."""
+        self._scanner_pos_cache[scanner_id] = np.array([x, y, z], dtype=np.float64)
+        
+    def _scanner_position(self, reading: Dict[str, Any]) -> np.ndarray:
+        """Get the position of the scanner behind a reading."""
+        position = self._scanner_pos_cache.get(reading["scanner_id"])
+        if position is None:
+            # Not announced since startup, use the stored location
+            position = np.asarray(reading["scanner_location"], dtype=np.float64)
+            self._scanner_pos_cache[reading["scanner_id"]] = position
+        return position
             
     def _get_kalman_filter(self, device_mac: str) -> KalmanFilter:
         """Get or create Kalman filter for device."""
@@ -114,23 +165,16 @@ class PositionCalculator:
             # Initialize filter
             kf = KalmanFilter(dim_x=6, dim_z=3)  # State: [x, y, z, vx, vy, vz]
             
-            # State transition matrix
+            # State transition matrix, constant velocity
             dt = 0.1  # Time step
-            kf.F = np.array([
-                [1, 0, 0, dt, 0, 0],
-                [0, 1, 0, 0, dt, 0],
-                [0, 0, 1, 0, 0, dt],
-                [0, 0, 0, 1, 0, 0],
-                [0, 0, 0, 0, 1, 0],
-                [0, 0, 0, 0, 0, 1]
-            ])
-            
-            # Measurement matrix
-            kf.H = np.array([
-                [1, 0, 0, 0, 0, 0],
-                [0, 1, 0, 0, 0, 0],
-                [0, 0, 1, 0, 0, 0]
-            ])
+            F = np.eye(6)
+            F[0, 3] = F[1, 4] = F[2, 5] = dt
+            kf.F = F
+            
+            # Measurement matrix, position only
+            H = np.zeros((3, 6))
+            H[0, 0] = H[1, 1] = H[2, 2] = 1.0
+            kf.H = H
             
             # Measurement noise
             kf.R = np.eye(3) * self.calibration.std_dev ** 2
@@ -139,8 +183,10 @@ class PositionCalculator:
             q = 0.1  # Process noise magnitude
             kf.Q = np.eye(6) * q
             
-            # Initial state uncertainty
-            kf.P *= 1000
+            # Initial state; uncertain enough that the first update moves
+            # it onto the measured position
+            kf.x = np.zeros(6)
+            kf.P = np.eye(6) * 1000.0
             
             self.kalman_filters[device_mac] = kf
             
@@ -148,73 +194,30 @@ class PositionCalculator:
         
     async def calculate_position(
         self,
+        device_mac: str,
         readings: List[Dict[str, Any]]
     ) -> Optional[Dict[str, Any]]:
-        """Calculate device position from RSSI readings."""
+        """Calculate device position from per-scanner RSSI readings."""
         try:
             if len(readings) < 3:
                 return None
                 
-            # Extract scanner positions and distances
-            scanner_positions = []
-            distances = []
-            
-            for reading in readings:
-                # Get scanner position
-                scanner_loc = json.loads(reading["scanner_location"])
-                scanner_pos = np.array([
-                    scanner_loc["coordinates"][0],
-                    scanner_loc["coordinates"][1],
-                    scanner_loc["coordinates"][2]
-                ])
-                scanner_positions.append(scanner_pos)
-                
-                # Convert RSSI to distance
-                distance = self._rssi_to_distance(reading["rssi"])
-                distances.append(distance)
-                
-            # Convert to numpy arrays
-            scanner_positions = np.array(scanner_positions)
-            distances = np.array(distances)
-            
-            # Define error function for minimization
-            def mse(point):
-                calculated_distances = np.linalg.norm(
-                    scanner_positions - point.reshape(1, 3),
-                    axis=1
-                )
-                return np.mean((calculated_distances - distances) ** 2)
-                
-            # Initial guess at centroid of scanners
-            initial_guess = np.mean(scanner_positions, axis=0)
-            
-            # Minimize error
-            result = minimize(
-                mse,
-                initial_guess,
-                method='nelder-mead',
-                options={'maxiter': 100}
-            )
-            
-            if not result.success:
+            # Scanner positions and distances
+            scanner_positions = np.stack([self._scanner_position(reading) for reading in readings])
+            rssi = np.fromiter((reading["rssi"] for reading in readings), dtype=np.float64, count=len(readings))
+            distances = self._rssi_to_distance(rssi)
+            
+            # Trilaterate
+            position = solve_position(scanner_positions, distances)
+            if position is None:
                 return None
                 
-            # Get device MAC from readings
-            device_mac = readings[0]["device_mac"]
-            
             # Apply Kalman filter
             kf = self._get_kalman_filter(device_mac)
             
-            # If this is first reading, initialize state
-            if kf.x is None:
-                kf.x = np.array([
-                    result.x[0], result.x[1], result.x[2],
-                    0, 0, 0
-                ])
-            
             # Update filter
             kf.predict()
-            kf.update(result.x)
+            kf.update(position)
             
             # Get filtered position
             filtered_pos = kf.x[:3]
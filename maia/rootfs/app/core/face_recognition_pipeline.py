@@ -1,6 +1,7 @@
 """
 Face recognition pipeline for MAIA.
 """
+import sys
 import cv2
 import numpy as np
 from typing import Dict, List, Tuple, Optional, Any
@@ -95,13 +96,19 @@ class FaceRecognitionPipeline:
                         min_distance = distances[best_match_idx]
                         
                         if min_distance <= self.distance_threshold:
-                            result["name"] = known_names[best_match_idx]
+                            name = known_names[best_match_idx]
+                            result["name"] = name
+                            # Interned so downstream lookups keyed on it
+                            # compare by identity
+                            result["name_lc"] = sys.intern(name.lower())
                             result["confidence"] = 1 - min_distance
                         else:
                             result["name"] = "unknown"
+                            result["name_lc"] = "unknown"
                             result["confidence"] = 1 - min_distance
                 else:
                     result["name"] = "unknown"
+                    result["name_lc"] = "unknown"
                 
                 # Filter out small faces
                 height = location[2] - location[0]
@@ -37,6 +37,19 @@ class HAClient:
             logger.error(f"Failed to validate token: {e}")
             return False
             
+    async def check_token(self, token: str) -> bool:
+        """Check whether a user supplied token is accepted by Home Assistant."""
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(
+                    f"{self.base_url}/api/",
+                    headers={"Authorization": f"Bearer {token}"}
+                ) as response:
+                    return response.status == 200
+        except Exception as e:
+            logger.error(f"Failed to check token: {e}")
+            return False
+            
     async def get_config(self) -> Dict[str, Any]:
         """Get Home Assistant configuration."""
         async with aiohttp.ClientSession() as session:
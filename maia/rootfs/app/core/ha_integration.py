@@ -4,10 +4,20 @@ Home Assistant integration for MAIA.
 import asyncio
 import logging
 import aiohttp
-import json
-from typing import Dict, Any, Optional, List
+import orjson
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 from urllib.parse import urljoin
+from functools import lru_cache
+
+def _dumps(obj: Any) -> str:
+    """Encode a WebSocket message with orjson."""
+    return orjson.dumps(obj).decode()
+
+@lru_cache(maxsize=1024)
+def entity_domain(entity_id: str) -> str:
+    """Get the domain part of an entity id."""
+    return entity_id.partition(".")[0]
 
 class HomeAssistantIntegration:
     """Integration with Home Assistant for device control and state management."""
@@ -18,9 +28,16 @@ class HomeAssistantIntegration:
         token: str,
         port: int = 8123,
         use_ssl: bool = False,
-        verify_ssl: bool = True
+        verify_ssl: bool = True,
+        session: Optional[aiohttp.ClientSession] = None,
+        connection_limit: int = 100
     ):
-        """Initialize Home Assistant integration."""
+        """Initialize Home Assistant integration.
+        
+        A session passed in is shared and left open on stop; otherwise the
+        integration creates and closes its own, pooling at most
+        connection_limit (up to 4096) connections.
+        """
         self.host = host
         self.token = token
         self.port = port
@@ -38,19 +55,29 @@ class HomeAssistantIntegration:
         self.message_id = 0
         self.message_callbacks: Dict[int, asyncio.Future] = {}
         
-        # Session for REST API calls
-        self.session: Optional[aiohttp.ClientSession] = None
+        # Session for REST API calls and the WebSocket connection
+        self.session: Optional[aiohttp.ClientSession] = session
+        self._owns_session = session is None
+        self.connection_limit = min(connection_limit, 4096)
         
     async def start(self) -> None:
         """Start the integration."""
         try:
-            # Create HTTP session
-            self.session = aiohttp.ClientSession(
-                headers={
-                    "Authorization": f"Bearer {self.token}",
-                    "Content-Type": "application/json"
-                }
-            )
+            # Create HTTP session unless one is shared with us
+            if not self.session:
+                connector = aiohttp.TCPConnector(
+                    limit=self.connection_limit,
+                    limit_per_host=30,
+                    keepalive_timeout=75
+                )
+                self.session = aiohttp.ClientSession(
+                    connector=connector,
+                    headers={
+                        "Authorization": f"Bearer {self.token}",
+                        "Content-Type": "application/json"
+                    }
+                )
+                self._owns_session = True
             
             # Connect WebSocket
             await self._connect_websocket()
@@ -75,9 +102,10 @@ class HomeAssistantIntegration:
                 except asyncio.CancelledError:
                     pass
                     
-            # Close HTTP session
-            if self.session:
+            # Close HTTP session if we created it
+            if self.session and self._owns_session:
                 await self.session.close()
+                self.session = None
                 
             self.logger.info("Home Assistant integration stopped")
             
@@ -90,7 +118,8 @@ class HomeAssistantIntegration:
             protocol = "wss" if self.use_ssl else "ws"
             ws_url = f"{protocol}://{self.host}:{self.port}/api/websocket"
             
-            self.ws = await aiohttp.ClientSession().ws_connect(
+            # Reuse the REST session's connection pool
+            self.ws = await self.session.ws_connect(
                 ws_url,
                 ssl=self.verify_ssl if self.use_ssl else None
             )
@@ -100,7 +129,7 @@ class HomeAssistantIntegration:
                 "type": "auth",
                 "access_token": self.token
             }
-            await self.ws.send_json(auth_msg)
+            await self.ws.send_json(auth_msg, dumps=_dumps)
             
             # Start message handler
             self.ws_task = asyncio.create_task(self._handle_messages())
@@ -116,7 +145,7 @@ class HomeAssistantIntegration:
         try:
             async for msg in self.ws:
                 if msg.type == aiohttp.WSMsgType.TEXT:
-                    data = json.loads(msg.data)
+                    data = orjson.loads(msg.data)
                     msg_type = data.get("type")
                     
                     if msg_type == "auth_required":
@@ -164,18 +193,20 @@ class HomeAssistantIntegration:
             await self._connect_websocket()
             
         self.message_id += 1
+        # Keep our own id, other commands may be sent while this one waits
+        msg_id = self.message_id
         msg = {
-            "id": self.message_id,
+            "id": msg_id,
             "type": command,
             **(data or {})
         }
         
         # Create future for response
         future = asyncio.Future()
-        self.message_callbacks[self.message_id] = future
+        self.message_callbacks[msg_id] = future
         
         # Send command
-        await self.ws.send_json(msg)
+        await self.ws.send_json(msg, dumps=_dumps)
         
         try:
             # Wait for response
@@ -184,7 +215,7 @@ class HomeAssistantIntegration:
             
         except asyncio.TimeoutError:
             self.logger.error(f"Timeout waiting for command response: {command}")
-            self.message_callbacks.pop(self.message_id, None)
+            self.message_callbacks.pop(msg_id, None)
             raise
             
     async def call_service(
@@ -223,7 +254,7 @@ class HomeAssistantIntegration:
             url = urljoin(self.base_url, f"/api/states/{entity_id}")
             async with self.session.get(url) as response:
                 if response.status == 200:
-                    return await response.json()
+                    return await response.json(loads=orjson.loads)
                 return None
                 
         except Exception as e:
@@ -239,7 +270,7 @@ class HomeAssistantIntegration:
             url = urljoin(self.base_url, "/api/states")
             async with self.session.get(url) as response:
                 if response.status == 200:
-                    return await response.json()
+                    return await response.json(loads=orjson.loads)
                 return []
                 
         except Exception as e:
@@ -252,7 +283,7 @@ class HomeAssistantIntegration:
         data: Optional[Dict[str, Any]] = None
     ) -> bool:
         """Turn on a device."""
-        domain = entity_id.split(".")[0]
+        domain = entity_domain(entity_id)
         return await self.call_service(
             domain,
             "turn_on",
@@ -266,7 +297,7 @@ class HomeAssistantIntegration:
         data: Optional[Dict[str, Any]] = None
     ) -> bool:
         """Turn off a device."""
-        domain = entity_id.split(".")[0]
+        domain = entity_domain(entity_id)
         return await self.call_service(
             domain,
             "turn_off",
@@ -280,7 +311,7 @@ class HomeAssistantIntegration:
         data: Optional[Dict[str, Any]] = None
     ) -> bool:
         """Toggle a device."""
-        domain = entity_id.split(".")[0]
+        domain = entity_domain(entity_id)
         return await self.call_service(
             domain,
             "toggle",
@@ -308,9 +339,9 @@ class HomeAssistantIntegration:
         value: Any,
         data: Optional[Dict[str, Any]] = None
     ) -> bool:
-        """Set entity value."""
-        domain = entity_id.split(".")[0]
-        service_data = {"value": value, **(data or {})}
+        """Set entity value, with data as extra attributes."""
+        domain = entity_domain(entity_id)
+        service_data = {"value": value, **data} if data else {"value": value}
         return await self.call_service(
             domain,
             "set_value",
@@ -318,6 +349,21 @@ class HomeAssistantIntegration:
             service_data
         )
         
+    async def set_values(
+        self,
+        entries: List[Tuple[str, Any, Optional[Dict[str, Any]]]]
+    ) -> bool:
+        """Set several entity values at once.
+        
+        The service calls are sent back to back over the WebSocket and their
+        responses awaited together, instead of one round trip after another.
+        """
+        results = await asyncio.gather(*(
+            self.set_value(entity_id, value, data)
+            for entity_id, value, data in entries
+        ))
+        return all(results)
+        
     async def play_media(
         self,
         entity_id: str,
@@ -73,7 +73,7 @@ class StructuredLogger:
             "connections": len(process.connections())
         }
     
-    def _log(self, level: int, msg: str, **kwargs):
+    def _log(self, level: int, msg: str, exc_info: bool = False, **kwargs):
         """Internal logging method with additional context and metrics."""
         timestamp = datetime.utcnow()
         
@@ -99,7 +99,7 @@ class StructuredLogger:
         if level == logging.DEBUG:
             extra["stack_trace"] = traceback.format_stack()
         
-        self.logger.log(level, msg, extra={"structured": extra})
+        self.logger.log(level, msg, exc_info=exc_info, extra={"structured": extra})
     
     def debug(self, msg: str, **kwargs):
         """Log debug message with extensive system information."""
@@ -117,6 +117,10 @@ class StructuredLogger:
         """Log error message with system metrics."""
         self._log(logging.ERROR, msg, **kwargs)
     
+    def exception(self, msg: str, **kwargs):
+        """Log error message with the traceback of the exception being handled."""
+        self._log(logging.ERROR, msg, exc_info=True, **kwargs)
+    
     def critical(self, msg: str, **kwargs):
         """Log critical message with full system state."""
         self._log(logging.CRITICAL, msg, **kwargs)
@@ -245,12 +249,11 @@ def log_request_middleware(app: FastAPI):
             return response
         except Exception as e:
             duration_ms = (time.time() - start_time) * 1000
-            logger.error(
+            logger.exception(
                 "Request failed",
                 method=request.method,
                 url=str(request.url),
                 error=str(e),
-                duration_ms=duration_ms,
-                traceback=traceback.format_exc()
+                duration_ms=duration_ms
             )
             raise 
\ No newline at end of file
@@ -1,6 +1,5 @@
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 import os
 
 # Get database URL from environment variable or use SQLite as default
@@ -9,31 +8,68 @@ DATABASE_URL = os.getenv(
     "sqlite:///data/maia.db"
 )
 
+# Sync URL schemes accepted in DATABASE_URL and the async drivers they map to
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+# Schemes that already name an async driver
+_ASYNC_SCHEMES = frozenset((
+    "sqlite+aiosqlite",
+    "postgresql+asyncpg",
+    "postgresql+psycopg",
+))
+
+def _async_url(url: str) -> str:
+    """Rewrite a database URL to use an async driver."""
+    scheme, sep, rest = url.partition("://")
+    scheme = scheme.lower()
+    if scheme in _ASYNC_SCHEMES:
+        return f"{scheme}{sep}{rest}"
+    driver = _ASYNC_DRIVERS.get(scheme)
+    if driver is None:
+        raise ValueError(
+            f"Unsupported DATABASE_URL scheme '{scheme}': use sqlite:// or "
+            f"postgresql://, or one of the async drivers {', '.join(sorted(_ASYNC_SCHEMES))}"
+        )
+    return f"{driver}{sep}{rest}"
+
 # Create SQLAlchemy engine
-engine = create_engine(
-    DATABASE_URL,
+engine = create_async_engine(
+    _async_url(DATABASE_URL),
     # Enable SQLite foreign key support
     connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-    # Enable connection pooling
+    # Enable connection pooling, sized for the concurrent requests of a
+    # single worker; overflow connections absorb short bursts
     pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10
+    pool_size=int(os.getenv("DATABASE_POOL_SIZE", "20")),
+    max_overflow=int(os.getenv("DATABASE_MAX_OVERFLOW", "10")),
+    pool_timeout=30,
+    pool_recycle=3600
 )
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Create session factory. Objects stay loaded after commit so handlers can
+# return them without triggering a lazy refresh outside the event loop.
+SessionLocal = async_sessionmaker(
+    engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
 
 # Create base class for declarative models
 Base = declarative_base()
 
 # Dependency to get database session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 # Initialize database tables
-def init_db():
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+async def init_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all) 
\ No newline at end of file
@@ -4,7 +4,7 @@ Handles face and command data storage using Valkey.
 """
 import json
 import numpy as np
-from typing import Dict, List, Optional, Any, Tuple
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
 import logging
 import asyncio
 from datetime import datetime, timedelta
@@ -334,24 +334,58 @@ class CommandStorage(StorageBase):
     ) -> List[Dict[str, Any]]:
         """Get recent commands."""
         try:
-            # Get command keys sorted by timestamp
-            pattern = self._key("cmd_*")
-            keys_str = await self._valkey_cmd("KEYS", pattern)
-            cmd_keys = sorted(keys_str.split("\n") if keys_str else [], reverse=True)
+            return [cmd async for cmd in self.iter_recent_commands(limit, offset)]
             
-            # Apply limit and offset
-            cmd_keys = cmd_keys[offset:offset + limit]
+        except Exception as e:
+            _LOGGER.error(f"Failed to get recent commands: {str(e)}")
+            return []
             
-            # Get command data in parallel
-            tasks = [self.get_command(key.split(":")[-1]) for key in cmd_keys]
+    async def recent_command_keys(
+        self,
+        limit: int = 100,
+        offset: int = 0
+    ) -> List[str]:
+        """Get the keys of recent commands, newest first."""
+        # Get command keys sorted by timestamp
+        pattern = self._key("cmd_*")
+        keys_str = await self._valkey_cmd("KEYS", pattern)
+        cmd_keys = sorted(keys_str.split("\n") if keys_str else [], reverse=True)
+        
+        # Apply limit and offset
+        return cmd_keys[offset:offset + limit]
+        
+    async def iter_commands(
+        self,
+        cmd_keys: List[str],
+        batch_size: int = 50
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the commands stored under the given keys, fetched in batches."""
+        for start in range(0, len(cmd_keys), batch_size):
+            # Get each batch of command data in parallel
+            tasks = [
+                self.get_command(key.split(":")[-1])
+                for key in cmd_keys[start:start + batch_size]
+            ]
             commands = await asyncio.gather(*tasks, return_exceptions=True)
             
             # Filter out errors and None values
-            return [cmd for cmd in commands if cmd and isinstance(cmd, dict)]
-            
-        except Exception as e:
-            _LOGGER.error(f"Failed to get recent commands: {str(e)}")
-            return []
+            for cmd in commands:
+                if cmd and isinstance(cmd, dict):
+                    yield cmd
+                    
+    async def iter_recent_commands(
+        self,
+        limit: int = 100,
+        offset: int = 0,
+        batch_size: int = 50
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield recent commands, fetching them from Valkey in batches.
+        
+        Failing to list the keys raises instead of ending the iteration.
+        """
+        cmd_keys = await self.recent_command_keys(limit, offset)
+        async for cmd in self.iter_commands(cmd_keys, batch_size):
+            yield cmd
             
     async def delete_old_commands(
         self,
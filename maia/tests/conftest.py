@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The add-on code is the "app" package under rootfs
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "rootfs"))
@@ -0,0 +1,67 @@
+from datetime import datetime, timezone
+import pytest
+from app.core.automation_rules import _compile_template, _TemplateValues, _EMPTY_MAPPING
+from app.database.geofencing import GeofenceEvent
+
+EVENT = GeofenceEvent(
+    event_type="enter",
+    zone_id="kitchen",
+    device_mac="aa:bb:cc:dd:ee:ff",
+    timestamp=datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc),
+    position=None
+)
+
+def format_like_before(template: str, variables: dict) -> str:
+    """Format a template with the str.format call the handlers used to make."""
+    return template.format(
+        device=EVENT.device_mac,
+        zone=EVENT.zone_id,
+        event=EVENT.event_type,
+        **variables
+    )
+
+def render(template: str, variables: dict) -> str:
+    """Format a template through the precompiled path."""
+    return _compile_template(template)(_TemplateValues(EVENT, variables or _EMPTY_MAPPING))
+
+@pytest.mark.parametrize("template,variables", [
+    ("{device} entered {zone}", {}),
+    ("Event: {event}", {}),
+    ("{device}/{zone}/{event}", {}),
+    ("Hello {name}, {device} is in {zone}", {"name": "Anna"}),
+    ("{count:03d} visits, {ratio:.1f}%", {"count": 7, "ratio": 12.345}),
+    ("{name!r} {name!s} {name!a}", {"name": "Åsa"}),
+    ("[{zone:>10}]", {}),
+    ("No placeholders", {}),
+    ("{{literal}} {zone}", {}),
+    ("", {}),
+    ("{items[0]} and {items[1]}", {"items": ["a", "b"]}),
+    ("{width}", {"width": 5}),
+])
+def test_matches_str_format(template, variables):
+    """Precompiled templates render exactly like str.format."""
+    assert render(template, variables) == format_like_before(template, variables)
+
+def test_nested_format_spec_matches_str_format():
+    """Nested format specs fall back to str.format."""
+    template = "[{zone:>{width}}]"
+    assert render(template, {"width": 12}) == format_like_before(template, {"width": 12})
+
+def test_variables_take_precedence_over_event_fields():
+    """A rule variable shadows the event attribute of the same name."""
+    assert render("{zone}", {"zone": "Kitchen"}) == "Kitchen"
+
+def test_compiled_template_is_reusable():
+    """One compiled template renders different values."""
+    compiled = _compile_template("{name} in {zone}")
+    assert compiled(_TemplateValues(EVENT, {"name": "A"})) == "A in kitchen"
+    assert compiled(_TemplateValues(EVENT, {"name": "B"})) == "B in kitchen"
+
+@pytest.mark.parametrize("template", ["Hi {unknown}", "{items[0]} {unknown}"])
+def test_unknown_field_raises_key_error(template):
+    """An unknown field raises the same KeyError as str.format."""
+    with pytest.raises(KeyError) as expected:
+        format_like_before(template, {"items": [1]})
+    with pytest.raises(KeyError) as raised:
+        render(template, {"items": [1]})
+    assert raised.value.args == expected.value.args == ("unknown",)
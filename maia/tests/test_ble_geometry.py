@@ -0,0 +1,47 @@
+import struct
+import pytest
+from shapely import wkb
+from shapely.geometry import Point
+from app.core.ble_tracker.database import encode_point_z, _encode_geometry
+
+@pytest.mark.parametrize("x,y,z", [
+    (0.0, 0.0, 0.0),
+    (1.5, -2.25, 3.0),
+    (24.9384, 60.1699, 12.5),
+    (-1e6, 1e-9, -0.0),
+])
+def test_encode_point_z_matches_shapely(x, y, z):
+    """The hand-packed EWKB equals shapely's little-endian EWKB."""
+    expected = wkb.dumps(Point(x, y, z), srid=4326, hex=False, byte_order=1)
+    assert encode_point_z(x, y, z) == expected
+
+def test_encode_point_z_layout():
+    """EWKB is the 29-byte WKB point z with a 4-byte SRID after the type."""
+    data = encode_point_z(1.0, 2.0, 3.0)
+    plain = wkb.dumps(Point(1.0, 2.0, 3.0), hex=False, byte_order=1)
+    assert len(plain) == 29
+    assert len(data) == 29 + 4
+
+    byte_order, geometry_type, srid = struct.unpack_from("<BII", data)
+    assert byte_order == 1  # little-endian
+    assert geometry_type == 0xA0000001  # Point | Z flag | SRID flag
+    assert srid == 4326
+    assert struct.unpack_from("<ddd", data, 9) == (1.0, 2.0, 3.0)
+
+def test_encode_point_z_srid():
+    """A custom SRID is written into the header."""
+    data = encode_point_z(1.0, 2.0, 3.0, srid=3857)
+    assert data == wkb.dumps(Point(1.0, 2.0, 3.0), srid=3857, hex=False, byte_order=1)
+
+def test_encode_point_z_round_trip():
+    """shapely reads back the point and its SRID."""
+    point = wkb.loads(encode_point_z(1.5, -2.25, 3.0))
+    assert (point.x, point.y, point.z) == (1.5, -2.25, 3.0)
+    assert wkb.dumps(point, include_srid=True, hex=False, byte_order=1)[5:9] == struct.pack("<I", 4326)
+
+def test_encode_geometry_accepts_bytes_and_tuples():
+    """Geometry parameters take EWKB bytes as-is or encode an (x, y, z) tuple."""
+    data = encode_point_z(1.0, 2.0, 3.0)
+    assert _encode_geometry(data) == data
+    assert _encode_geometry(bytearray(data)) == data
+    assert _encode_geometry((1.0, 2.0, 3.0)) == data
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from app.core.ble_tracker.position_calculator import solve_position
+
+SCANNERS = np.array([
+    [0.0, 0.0, 0.0],
+    [10.0, 0.0, 0.0],
+    [0.0, 8.0, 0.0],
+    [0.0, 0.0, 3.0],
+])
+
+def ranges(scanners: np.ndarray, point) -> np.ndarray:
+    """Exact distances from each scanner to point."""
+    return np.linalg.norm(scanners - np.asarray(point, dtype=np.float64), axis=1)
+
+@pytest.mark.parametrize("point", [
+    [3.0, 4.0, 1.5],
+    [9.0, 7.0, 2.5],
+    [0.5, 0.5, 0.5],
+    [-2.0, 12.0, 4.0],
+])
+def test_four_scanners_recover_point(point):
+    """Exact ranges from four non-coplanar scanners give back the point."""
+    position = solve_position(SCANNERS, ranges(SCANNERS, point))
+    np.testing.assert_allclose(position, point, atol=1e-6)
+
+def test_more_scanners_than_needed():
+    """An overdetermined layout still recovers the point."""
+    scanners = np.vstack([SCANNERS, [[10.0, 8.0, 3.0], [5.0, 4.0, 0.0]]])
+    point = [6.0, 2.0, 1.0]
+    position = solve_position(scanners, ranges(scanners, point))
+    np.testing.assert_allclose(position, point, atol=1e-6)
+
+def test_three_scanners_minimum_norm_seed():
+    """Three scanners seed with the minimum-norm solution in their plane."""
+    scanners = SCANNERS[:3]
+    point = [3.0, 4.0, 0.0]
+    distances = ranges(scanners, point)
+
+    # Two equations in three unknowns; lstsq picks the point in the plane
+    A = 2 * (scanners[1:] - scanners[0])
+    squared_norms = np.einsum('ij,ij->i', scanners, scanners)
+    b = distances[0] ** 2 - distances[1:] ** 2 + squared_norms[1:] - squared_norms[0]
+    seed, _, rank, _ = np.linalg.lstsq(A, b, rcond=None)
+    assert rank == 2
+    np.testing.assert_allclose(seed, point, atol=1e-9)
+
+    position = solve_position(scanners, distances)
+    np.testing.assert_allclose(position, point, atol=1e-6)
+
+def test_noisy_ranges_stay_close():
+    """Small range errors give a nearby estimate."""
+    point = np.array([4.0, 3.0, 1.0])
+    noise = np.array([0.05, -0.05, 0.03, -0.02])
+    position = solve_position(SCANNERS, ranges(SCANNERS, point) + noise)
+    assert np.linalg.norm(position - point) < 0.5
+
+@pytest.mark.parametrize("scanners", [
+    np.zeros((4, 3)),
+    np.array([[0.0, 0.0, 0.0], [5.0, 0.0, 0.0], [10.0, 0.0, 0.0]]),
+    np.array([[0.0, 0.0, 0.0], [1.0, 1.0, 1.0], [2.0, 2.0, 2.0], [4.0, 4.0, 4.0]]),
+])
+def test_degenerate_layout_returns_none(scanners):
+    """Coincident or collinear scanners cannot fix a position."""
+    assert solve_position(scanners, ranges(scanners, [3.0, 4.0, 1.5])) is None
+
+@pytest.mark.parametrize("bad", [np.nan, np.inf])
+def test_non_finite_range_returns_none(bad):
+    """A non-finite range returns None instead of raising."""
+    distances = ranges(SCANNERS, [3.0, 4.0, 1.5])
+    distances[1] = bad
+    assert solve_position(SCANNERS, distances) is None
@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta, timezone
+from app.core.automation_rules import SlidingCounters
+from app.database.geofencing import GeofenceEvent
+
+NOW = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+ENTER_5MIN = ("enter", None, None, timedelta(minutes=5))
+EXIT_5MIN = ("exit", None, None, timedelta(minutes=5))
+
+def make_event(seconds_ago: float, device_mac: str = "aa:bb", event_type: str = "enter") -> GeofenceEvent:
+    """Create a geofence event seconds_ago before NOW."""
+    return GeofenceEvent(
+        event_type=event_type,
+        zone_id="kitchen",
+        device_mac=device_mac,
+        timestamp=NOW - timedelta(seconds=seconds_ago),
+        position=None
+    )
+
+def make_counters(*specs, history_limit: int = 1000) -> SlidingCounters:
+    """Create counters tracking specs with no backfilled history."""
+    counters = SlidingCounters(history_limit)
+    counters.track(set(specs), {})
+    return counters
+
+def test_count_includes_window_start():
+    """An event exactly at the window start is counted, one before is not."""
+    counters = make_counters(ENTER_5MIN)
+    counters.add(make_event(300.001))
+    counters.add(make_event(300))
+    counters.add(make_event(10))
+
+    assert counters.count(ENTER_5MIN, "aa:bb", now=NOW) == 2
+    assert counters.count(ENTER_5MIN, "aa:bb", now=NOW + timedelta(seconds=1)) == 1
+
+def test_count_without_time_window_counts_all():
+    """A spec without a time window counts every event up to the limit."""
+    spec = ("enter", None, None, None)
+    counters = make_counters(spec, history_limit=5)
+    for seconds_ago in range(8):
+        counters.add(make_event(3600 * seconds_ago))
+
+    assert counters.count(spec, "aa:bb", now=NOW) == 5
+
+def test_expired_entries_trimmed_after_64():
+    """Entries before the window are dropped once 64 have expired."""
+    counters = make_counters(ENTER_5MIN)
+    for seconds_ago in range(1000, 1000 - (SlidingCounters._TRIM_AT - 1), -1):
+        counters.add(make_event(seconds_ago))
+    counters.add(make_event(1))
+    window = counters._windows[(ENTER_5MIN, "aa:bb")]
+
+    # 63 expired entries are kept
+    assert counters.count(ENTER_5MIN, "aa:bb", now=NOW) == 1
+    assert len(window) == SlidingCounters._TRIM_AT
+
+    # Once the recent one expires too, all 64 are trimmed
+    assert counters.count(ENTER_5MIN, "aa:bb", now=NOW + timedelta(minutes=10)) == 0
+    assert window == []
+
+def test_trim_keeps_entries_in_window():
+    """Trimming drops only the expired entries."""
+    counters = make_counters(ENTER_5MIN)
+    for seconds_ago in range(1000, 1000 - SlidingCounters._TRIM_AT, -1):
+        counters.add(make_event(seconds_ago))
+    counters.add(make_event(2))
+    counters.add(make_event(1))
+    window = counters._windows[(ENTER_5MIN, "aa:bb")]
+
+    assert counters.count(ENTER_5MIN, "aa:bb", now=NOW) == 2
+    assert window == [
+        (NOW - timedelta(seconds=2)).timestamp(),
+        (NOW - timedelta(seconds=1)).timestamp()
+    ]
+
+def test_insert_bounded_by_history_limit():
+    """A window keeps at most history_limit entries once it overflows."""
+    spec = ("enter", None, None, None)
+    counters = make_counters(spec, history_limit=10)
+    for seconds_ago in range(10 + SlidingCounters._TRIM_AT, 0, -1):
+        counters.add(make_event(seconds_ago))
+
+    window = counters._windows[(spec, "aa:bb")]
+    assert len(window) == 10
+    assert window[-1] == (NOW - timedelta(seconds=1)).timestamp()
+
+def test_out_of_order_events_stay_sorted():
+    """Late events are inserted in timestamp order."""
+    counters = make_counters(ENTER_5MIN)
+    for seconds_ago in (10, 30, 20, 400, 5):
+        counters.add(make_event(seconds_ago))
+
+    window = counters._windows[(ENTER_5MIN, "aa:bb")]
+    assert window == sorted(window)
+    assert counters.count(ENTER_5MIN, "aa:bb", now=NOW) == 4
+
+def test_counts_kept_per_device_and_spec():
+    """Devices and specs are counted in separate windows."""
+    counters = make_counters(ENTER_5MIN, EXIT_5MIN)
+    counters.add(make_event(10, "aa:bb"))
+    counters.add(make_event(20, "aa:bb"))
+    counters.add(make_event(10, "cc:dd"))
+    counters.add(make_event(10, "aa:bb", event_type="exit"))
+    counters.add(make_event(10, "aa:bb", event_type="dwell"))
+
+    assert counters.count(ENTER_5MIN, "aa:bb", now=NOW) == 2
+    assert counters.count(ENTER_5MIN, "cc:dd", now=NOW) == 1
+    assert counters.count(EXIT_5MIN, "aa:bb", now=NOW) == 1
+    assert counters.count(EXIT_5MIN, "cc:dd", now=NOW) == 0
+    assert counters.count(ENTER_5MIN, "ee:ff", now=NOW) == 0
+
+def test_spec_without_event_type_counts_every_event():
+    """A spec with no event type counts events of any type."""
+    spec = (None, "kitchen", None, timedelta(minutes=5))
+    counters = make_counters(spec)
+    for event_type in ("enter", "dwell", "exit"):
+        counters.add(make_event(10, event_type=event_type))
+
+    assert counters.count(spec, "aa:bb", now=NOW) == 3
+
+def test_track_backfills_new_specs():
+    """Newly tracked specs are counted from the given histories."""
+    history = [make_event(10), make_event(20), make_event(600)]
+    counters = SlidingCounters(1000)
+    counters.track({ENTER_5MIN}, {"aa:bb": history})
+
+    assert counters.count(ENTER_5MIN, "aa:bb", now=NOW) == 2
+
+    # Untracked specs lose their windows
+    counters.track({EXIT_5MIN}, {"aa:bb": history})
+    assert counters.count(ENTER_5MIN, "aa:bb", now=NOW) == 0